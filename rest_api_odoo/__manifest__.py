@@ -21,7 +21,7 @@
 #############################################################################
 {
     "name": "Odoo rest API",
-    "version": "18.0.1.0.1",
+    "version": "18.0.1.0.2",
     "category": "Tools",
     "summary": """This app helps to interact with odoo, backend with help of 
      rest api requests""",
@@ -34,6 +34,7 @@
     "depends": ['base', 'web'],
     "data": [
         'security/ir.model.access.csv',
+        'data/ir_cron_data.xml',
         'views/res_users_views.xml',
         'views/connection_api_views.xml'
     ],
@@ -19,14 +19,34 @@
 #    If not, see <http://www.gnu.org/licenses/>.
 #
 #############################################################################
+import gzip
+import hashlib
 import json
 import logging
-from odoo import http
+import psycopg2
+from odoo import api, http
+from odoo.exceptions import UserError
 from odoo.http import request
-from datetime import datetime, date
+from odoo.osv import expression
+from odoo.addons.rest_api_odoo.models.res_users import API_TOKEN_LIFETIME
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
 
 _logger = logging.getLogger(__name__)
 
+STREAM_CHUNK_SIZE = 1000
+# Page size of a list GET without 'limit', and the largest page accepted
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+COMPRESSION_MIN_SIZE = 1024
+
+# Errors raised by invalid values sent in a POST or PUT request. Any of them
+# rolls the whole batch back to its savepoint
+WRITE_ERRORS = (KeyError, TypeError, ValueError, UserError, psycopg2.Error)
+
 
 class RestApi(http.Controller):
     """This is a controller which is used to generate responses based on the
@@ -34,145 +54,334 @@ class RestApi(http.Controller):
 
     def auth_api_key(self, api_key):
         """This function is used to authenticate the api-key when sending a
-        request"""
-        user_id = request.env['res.users'].sudo().search([('api_key', '=', api_key)])
-        if api_key is not None and user_id:
-             response = True
-        elif not user_id:
-            response = ('<html><body><h2>Invalid <i>API Key</i> '
-                        '!</h2></body></html>')
+        request. The key is resolved through the cached api-key lookup of
+        res.users and the request environment is switched to its user."""
+        if api_key is None:
+            return ("<html><body><h2>No <i>API Key</i> Provided "
+                    "!</h2></body></html>")
+        resolved = request.env['res.users'].sudo()._resolve_api_key(api_key)
+        if not resolved:
+            return ('<html><body><h2>Invalid <i>API Key</i> '
+                    '!</h2></body></html>')
+        uid, context = resolved
+        request.update_env(user=uid, context=context)
+        return True
+
+    def auth_bearer_token(self, token):
+        """This function is used to authenticate the bearer token issued by
+        /odoo_connect. The token is verified from its signature only, without
+        reading the session store nor checking a password"""
+        resolved = request.env['res.users'].sudo()._verify_api_token(token)
+        if not resolved:
+            return ('<html><body><h2>Invalid or expired <i>Token</i> '
+                    '!</h2></body></html>')
+        uid, context = resolved
+        request.update_env(user=uid, context=context)
+        return True
+
+    def drop_nulls(self, value):
+        """This function is used to remove the null values of a payload for
+        the compact mode"""
+        if isinstance(value, dict):
+            return {key: self.drop_nulls(val) for key, val in value.items()
+                    if val is not None}
+        if isinstance(value, list):
+            return [self.drop_nulls(val) for val in value]
+        return value
+
+    def json_response(self, payload, headers=None, status=200):
+        """This function is used to build a JSON response. With the
+        'compact' query parameter the null values and the whitespaces are
+        removed, and payloads above COMPRESSION_MIN_SIZE are compressed with
+        brotli or gzip according to the Accept-Encoding header"""
+        httprequest = request.httprequest
+        if httprequest.args.get('compact') in ('1', 'true'):
+            data = json.dumps(self.drop_nulls(payload),
+                              separators=(',', ':'))
         else:
-            response = ("<html><body><h2>No <i>API Key</i> Provided "
-                        "!</h2></body></html>")
-        return response
+            data = json.dumps(payload)
+        data = data.encode()
+        headers = list(headers or []) + [('Vary', 'Accept-Encoding')]
+        if len(data) >= COMPRESSION_MIN_SIZE:
+            if brotli and httprequest.accept_encodings['br']:
+                data = brotli.compress(data)
+                headers.append(('Content-Encoding', 'br'))
+            elif httprequest.accept_encodings['gzip']:
+                data = gzip.compress(data, compresslevel=6)
+                headers.append(('Content-Encoding', 'gzip'))
+        return request.make_response(data=[data], headers=headers,
+                                     status=status)
 
-    def generate_response(self, method, model, rec_id):
+    def read_records(self, plan, domain, fields, limit=None, offset=0,
+                     order=None, load='_classic_read'):
+        """This function is used to read the records matching the domain in
+        a single search_read and to convert the date values to iso format,
+        using the date fields of the read plan"""
+        records = request.env[plan['model']].search_read(
+            domain=domain, fields=fields, limit=limit, offset=offset,
+            order=order, load=load)
+        self.convert_dates(plan, fields, records)
+        return records
+
+    def convert_dates(self, plan, fields, records):
+        """This function is used to convert the date and datetime values of
+        the records to iso format"""
+        temporal_fields = plan['temporal_fields'].intersection(fields)
+        for record in records:
+            for key in temporal_fields:
+                if record.get(key):
+                    record[key] = record[key].isoformat()
+
+    def compute_etag(self, plan, domain):
+        """This function is used to compute the validator of a GET response
+        from a single aggregate query: the number of matching records and
+        their latest write date, together with the user and the request
+        itself. The etag is weak, as the same content may be sent compressed
+        or not. Returns the etag and, when the client already holds it, the
+        304 response to send back"""
+        [(count, last_write)] = request.env[plan['model']]._read_group(
+            domain, aggregates=['__count', 'write_date:max'])
+        digest = hashlib.sha1(json.dumps([
+            plan['model'], request.env.uid, request.env.lang,
+            request.httprequest.query_string.decode(),
+            request.httprequest.get_data(as_text=True),
+            count, str(last_write),
+        ]).encode()).hexdigest()
+        etag = 'W/"%s"' % digest
+        if request.httprequest.if_none_match.contains_weak(digest):
+            return etag, request.make_response(
+                '', headers=[('ETag', etag), ('Vary', 'Accept-Encoding')],
+                status=304)
+        return etag, None
+
+    def read_page(self, plan, data, fields, load):
+        """This function is used to read a page of records. The request may
+        carry a 'domain', a 'limit', and either an 'order' with an 'offset'
+        or a keyset 'cursor' (the last id received). 'since' only returns
+        the records written after the given date. When keyset pagination is
+        used and the page is full, 'next_cursor' holds the cursor of the
+        next page. With 'stream', all the matching records are streamed.
+        The page size defaults to DEFAULT_PAGE_SIZE and is capped at
+        MAX_PAGE_SIZE"""
+        try:
+            connection = request.env['connection.api']
+            domain = connection._check_domain(plan, data.get('domain') or [])
+            limit = int(data.get('limit') or DEFAULT_PAGE_SIZE)
+            if limit <= 0:
+                raise ValueError("Invalid limit %r" % limit)
+            limit = min(limit, MAX_PAGE_SIZE)
+            offset = int(data.get('offset') or 0)
+            order = data.get('order')
+            if order:
+                order = connection._check_order(plan, order)
+            cursor = int(data['cursor']) if data.get('cursor') else None
+        except (TypeError, ValueError):
+            return ("<html><body><h2>Invalid Domain"
+                    "</h2></body></html>")
+        if cursor is not None and (order or offset):
+            return request.make_response(
+                "<html><body><h2>A cursor cannot be combined with an order "
+                "or an offset</h2></body></html>", status=400)
+        if data.get('since'):
+            domain = expression.AND([
+                domain, [('write_date', '>', data['since'])]])
+        etag, not_modified = self.compute_etag(plan, domain)
+        if not_modified:
+            return not_modified
+        if data.get('stream'):
+            return self.stream_records(plan, domain, fields, load, etag)
+        keyset = not order and not offset
+        if keyset:
+            if cursor is not None:
+                domain = expression.AND([domain, [('id', '>', cursor)]])
+            order = 'id'
+        records = self.read_records(
+            plan, domain, fields, limit=limit, offset=offset, order=order,
+            load=load)
+        page_full = len(records) == limit
+        return self.json_response({
+            'records': records,
+            'next_cursor': records[-1]['id'] if keyset and page_full else None,
+            'next_offset': offset + limit if not keyset and page_full
+            else None,
+        }, headers=[('ETag', etag)])
+
+    def stream_records(self, plan, domain, fields, load, etag):
+        """This function is used to stream every record matching the domain
+        as one JSON document. The records are read in chunks of
+        STREAM_CHUNK_SIZE ids and serialized one by one, so that neither the
+        whole recordset nor the whole document is held in memory. The
+        generator runs after the request cursor is closed, hence it opens
+        its own cursor"""
+        registry = request.env.registry
+        uid = request.env.uid
+        context = dict(request.env.context)
+
+        def generate():
+            with registry.cursor() as cr:
+                env = api.Environment(cr, uid, context)
+                model = env[plan['model']]
+                yield '{"records": ['
+                last_id = 0
+                separator = ''
+                while True:
+                    records = model.search_read(
+                        domain=expression.AND([
+                            domain, [('id', '>', last_id)]]),
+                        fields=fields, limit=STREAM_CHUNK_SIZE, order='id',
+                        load=load)
+                    self.convert_dates(plan, fields, records)
+                    for record in records:
+                        yield separator + json.dumps(record)
+                        separator = ', '
+                    if len(records) < STREAM_CHUNK_SIZE:
+                        break
+                    last_id = records[-1]['id']
+                    env.invalidate_all()
+                yield '], "next_cursor": null}'
+
+        return request.make_response(
+            generate(), headers=[('Content-Type', 'application/json'),
+                                 ('ETag', etag)])
+
+    def write_records(self, plan, updates):
+        """This function is used to apply a list of [id, values] update
+        pairs, grouped by connection.api. It returns the ids of the updated
+        records, or None when one of them does not exist"""
+        return request.env['connection.api']._write_records(
+            request.env[plan['model']], updates)
+
+    def enqueue_job(self, model_name, method, payload):
+        """This function is used to store a POST or PUT request sent with
+        'async' in the job queue. The response only carries the job id, whose
+        status is available on /send_request/job/<id>"""
+        job = request.env['connection.api.job'].enqueue(
+            model_name, method, payload)
+        return self.json_response(job.get_status(), status=202)
+
+    def generate_response(self, method, plan, rec_id):
         """This function is used to generate the response based on the type
-        of request and the parameters given"""
-        option = request.env['connection.api'].search(
-            [('model_id', '=', model)], limit=1)
-        model_name = option.model_id.model
+        of request and the parameters given. GET accepts a list of 'ids',
+        POST a list of 'values' and PUT a list of [id, values] 'updates', so
+        that several records are handled in one request. The model and its
+        fields are resolved from the cached read plan of connection.api"""
+        if not plan:
+            return ("<html><body><h2>No Record Created for the model"
+                    "</h2></body></html>")
+        model_name = plan['model']
         if method != 'DELETE':
             data = json.loads(request.httprequest.data)
         else:
             data = {}
-        fields = []
-        if data:
-            for field in data['fields']:
-                fields.append(field)
+        fields = list(data.get('fields') or plan['default_fields'])
         if not fields and method != 'DELETE':
             return ("<html><body><h2>No fields selected for the model"
                     "</h2></body></html>")
-        if not option:
-            return ("<html><body><h2>No Record Created for the model"
+        try:
+            connection = request.env['connection.api']
+            connection._check_fields(plan, fields)
+            values = data.get('values') or []
+            for vals in values if isinstance(values, list) else [values]:
+                connection._check_fields(plan, vals)
+            for _rec_id, vals in data.get('updates') or []:
+                connection._check_fields(plan, vals)
+        except (TypeError, ValueError):
+            return ("<html><body><h2>Field Not Allowed"
                     "</h2></body></html>")
+        load = None if data.get('flat') else '_classic_read'
         try:
             if method == 'GET':
-                fields = []
-                for field in data['fields']:
-                    fields.append(field)
-                if not option.is_get:
+                if not plan['is_get']:
                     return ("<html><body><h2>Method Not Allowed"
                             "</h2></body></html>")
                 else:
-                    datas = []
-                    if rec_id != 0:
-                        partner_records = request.env[
-                            str(model_name)].search_read(
-                            domain=[('id', '=', rec_id)],
-                            fields=fields
-                        )
-                        for record in partner_records:
-                            for key, value in record.items():
-                                if isinstance(value, (datetime, date)):
-                                    record[key] = value.isoformat()
-                        data = json.dumps({
-                            'records': partner_records
-                        })
-                        datas.append(data)
-                        return request.make_response(data=datas)
+                    if data.get('ids'):
+                        domain = [('id', 'in', [
+                            int(i) for i in data['ids']])]
+                    elif rec_id != 0:
+                        domain = [('id', '=', rec_id)]
                     else:
-                        partner_records = request.env[
-                            str(model_name)].search_read(
-                            domain=[],
-                            fields=fields
-                        )
-                        for record in partner_records:
-                            for key, value in record.items():
-                                if isinstance(value, (datetime, date)):
-                                    record[key] = value.isoformat()
-                        data = json.dumps({
-                            'records': partner_records
-                        })
-                        datas.append(data)
-                        return request.make_response(data=datas)
+                        return self.read_page(plan, data, fields, load)
+                    etag, not_modified = self.compute_etag(plan, domain)
+                    if not_modified:
+                        return not_modified
+                    partner_records = self.read_records(
+                        plan, domain, fields, load=load)
+                    return self.json_response({
+                        'records': partner_records
+                    }, headers=[('ETag', etag)])
         except:
             return ("<html><body><h2>Invalid JSON Data"
                     "</h2></body></html>")
         if method == 'POST':
-            if not option.is_post:
+            if not plan['is_post']:
                 return ("<html><body><h2>Method Not Allowed"
                         "</h2></body></html>")
+            elif data.get('async'):
+                if not data.get('values'):
+                    return ("<html><body><h2>Invalid JSON Data"
+                            "</h2></body></html>")
+                return self.enqueue_job(model_name, method, {
+                    'values': data['values']})
             else:
                 try:
-                    data = json.loads(request.httprequest.data)
-                    datas = []
-                    new_resource = request.env[str(model_name)].create(
-                        data['values'])
-                    partner_records = request.env[
-                        str(model_name)].search_read(
-                        domain=[('id', '=', new_resource.id)],
-                        fields=fields
-                    )
-                    for record in partner_records:
-                        for key, value in record.items():
-                            if isinstance(value, (datetime, date)):
-                                record[key] = value.isoformat()
-                    new_data = json.dumps({'New resource': partner_records, })
-                    datas.append(new_data)
-                    return request.make_response(data=datas)
-                except:
+                    with request.env.cr.savepoint():
+                        new_resource = request.env[model_name].create(
+                            data['values'])
+                    partner_records = self.read_records(
+                        plan, [('id', 'in', new_resource.ids)], fields,
+                        load=load)
+                    return self.json_response(
+                        {'New resource': partner_records, })
+                except WRITE_ERRORS as error:
+                    _logger.info("Rest API create on %s failed: %s",
+                                 model_name, error)
                     return ("<html><body><h2>Invalid JSON Data"
                             "</h2></body></html>")
         if method == 'PUT':
-            if not option.is_put:
+            if not plan['is_put']:
                 return ("<html><body><h2>Method Not Allowed"
                         "</h2></body></html>")
             else:
-                if rec_id == 0:
+                if data.get('updates'):
+                    updates = data['updates']
+                elif rec_id == 0:
                     return ("<html><body><h2>No ID Provided"
                             "</h2></body></html>")
                 else:
-                    resource = request.env[str(model_name)].browse(
-                        int(rec_id))
-                    if not resource.exists():
+                    updates = [(rec_id, data.get('values'))]
+                if data.get('async'):
+                    try:
+                        rec_ids = {int(rec_id) for rec_id, _vals in updates}
+                    except (TypeError, ValueError):
+                        return ("<html><body><h2>Invalid JSON Data "
+                                "!</h2></body></html>")
+                    if len(request.env[model_name].browse(
+                            rec_ids).exists()) != len(rec_ids):
                         return ("<html><body><h2>Resource not found"
                                 "</h2></body></html>")
-                    else:
-                        try:
-                            datas = []
-                            data = json.loads(request.httprequest.data)
-                            resource.write(data['values'])
-                            partner_records = request.env[
-                                str(model_name)].search_read(
-                                domain=[('id', '=', resource.id)],
-                                fields=fields
-                            )
-                            for record in partner_records:
-                                for key, value in record.items():
-                                    if isinstance(value, (datetime, date)):
-                                        record[key] = value.isoformat()
-                            new_data = json.dumps(
-                                {'Updated resource': partner_records,
-                                 })
-                            datas.append(new_data)
-                            return request.make_response(data=datas)
-
-                        except:
-                            return ("<html><body><h2>Invalid JSON Data "
-                                    "!</h2></body></html>")
+                    return self.enqueue_job(model_name, method, {
+                        'updates': updates})
+                try:
+                    # The groups are written under one savepoint, so that a
+                    # failing group also reverts the groups written before it
+                    with request.env.cr.savepoint():
+                        rec_ids = self.write_records(plan, updates)
+                    if rec_ids is None:
+                        return ("<html><body><h2>Resource not found"
+                                "</h2></body></html>")
+                    partner_records = self.read_records(
+                        plan, [('id', 'in', rec_ids)], fields, load=load)
+                    return self.json_response(
+                        {'Updated resource': partner_records,
+                         })
+                except WRITE_ERRORS as error:
+                    _logger.info("Rest API write on %s failed: %s",
+                                 model_name, error)
+                    return ("<html><body><h2>Invalid JSON Data "
+                            "!</h2></body></html>")
         if method == 'DELETE':
-            if not option.is_delete:
+            if not plan['is_delete']:
                 return ("<html><body><h2>Method Not Allowed"
                         "</h2></body></html>")
             else:
@@ -180,7 +389,7 @@ class RestApi(http.Controller):
                     return ("<html><body><h2>No ID Provided"
                             "</h2></body></html>")
                 else:
-                    resource = request.env[str(model_name)].browse(
+                    resource = request.env[model_name].browse(
                         int(rec_id))
                     if not resource.exists():
                         return ("<html><body><h2>Resource not found"
@@ -188,7 +397,7 @@ class RestApi(http.Controller):
                     else:
 
                         records = request.env[
-                            str(model_name)].search_read(
+                            model_name].search_read(
                             domain=[('id', '=', resource.id)],
                             fields=['id', 'display_name']
                         )
@@ -198,39 +407,55 @@ class RestApi(http.Controller):
                         resource.unlink()
                         return request.make_response(data=remove)
 
+    def authenticate_request(self):
+        """This function is used to authenticate a request from its bearer
+        token, or from its api-key"""
+        authorization = request.httprequest.headers.get('Authorization', '')
+        if authorization.startswith('Bearer '):
+            return self.auth_bearer_token(authorization[7:].strip())
+        api_key = request.httprequest.headers.get('api-key')
+        return self.auth_api_key(api_key)
+
     @http.route(['/send_request'], type='http',
                 auth='none',
                 methods=['GET', 'POST', 'PUT', 'DELETE'], csrf=False)
     def fetch_data(self, **kw):
         """This controller will be called when sending a request to the
-        specified url, and it will authenticate the api-key and then will
-        generate the result"""
+        specified url, and it will authenticate the bearer token or the
+        api-key and then will generate the result"""
         http_method = request.httprequest.method
 
-        api_key = request.httprequest.headers.get('api-key')
-        auth_api = self.auth_api_key(api_key)
+        auth_api = self.authenticate_request()
         model = kw.get('model')
-        username = request.httprequest.headers.get('login')
-        password = request.httprequest.headers.get('password')
-        credential = {'login': username, 'password': password, 'type': 'password'}
-        request.session.authenticate(request.session.db, credential)
-        model_id = request.env['ir.model'].search(
-            [('model', '=', model)])
-        if not model_id:
+        if auth_api != True:
+            return auth_api
+        if model not in request.env.registry:
             return ("<html><body><h3>Invalid model, check spelling or maybe "
                     "the related "
                     "module is not installed"
                     "</h3></body></html>")
 
-        if auth_api == True:
-            if not kw.get('Id'):
-                rec_id = 0
-            else:
-                rec_id = int(kw.get('Id'))
-            result = self.generate_response(http_method, model_id.id, rec_id)
-            return result
+        if not kw.get('Id'):
+            rec_id = 0
         else:
+            rec_id = int(kw.get('Id'))
+        plan = request.env['connection.api']._get_read_plan(model)
+        result = self.generate_response(http_method, plan, rec_id)
+        return result
+
+    @http.route(['/send_request/job/<int:job_id>'], type='http',
+                auth='none', methods=['GET'], csrf=False)
+    def job_status(self, job_id, **kw):
+        """This controller is used to get the status and the result of a
+        request sent in async mode"""
+        auth_api = self.authenticate_request()
+        if auth_api != True:
             return auth_api
+        job = request.env['connection.api.job'].sudo().browse(job_id)
+        if not job.exists() or job.user_id.id != request.env.uid:
+            return ("<html><body><h2>Job not found"
+                    "</h2></body></html>")
+        return self.json_response(job.get_status())
 
     @http.route(['/odoo_connect'], type="http", auth="none", csrf=False,
                 methods=['GET'])
@@ -250,7 +475,9 @@ class RestApi(http.Controller):
             api_key = request.env.user.generate_api(username)
             datas = json.dumps({"Status": "auth successful",
                                 "User": user.name,
-                                "api-key": api_key})
+                                "api-key": api_key,
+                                "token": user.generate_api_token(),
+                                "expires_in": API_TOKEN_LIFETIME})
             return request.make_response(data=datas)
         except:
             return ("<html><body><h2>wrong login credentials"
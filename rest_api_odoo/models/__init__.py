@@ -20,4 +20,5 @@
 #
 #############################################################################
 from . import connection_api
+from . import connection_api_job
 from . import res_users
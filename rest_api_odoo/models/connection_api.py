@@ -19,7 +19,18 @@
 #    If not, see <http://www.gnu.org/licenses/>.
 #
 #############################################################################
-from odoo import fields, models
+import json
+import time
+from odoo import api, fields, models
+from odoo.osv import expression
+from odoo.tools.lru import LRU
+
+# Maps (database, model) to (expiry, read plan). The cache is local to the
+# module, so that a configuration change only drops the read plans instead
+# of the whole registry cache; every entry expires, so a change made from
+# another worker is applied after at most READ_PLAN_CACHE_TTL seconds.
+READ_PLAN_CACHE_TTL = 300
+_read_plans = LRU(256)
 
 
 class ConnectionApi(models.Model):
@@ -45,3 +56,168 @@ class ConnectionApi(models.Model):
     is_delete = fields.Boolean(string='DELETE',
                                help="Select this to enable DELETE method "
                                     "while sending requests.")
+
+    allowed_field_ids = fields.Many2many(
+        'ir.model.fields', 'connection_api_allowed_field_rel',
+        'connection_id', 'field_id', string="Allowed Fields",
+        domain="[('model_id', '=', model_id)]",
+        help="Fields which can be read, written and filtered on through "
+             "REST api requests. Leave empty to allow every field.")
+    default_field_ids = fields.Many2many(
+        'ir.model.fields', 'connection_api_default_field_rel',
+        'connection_id', 'field_id', string="Default Fields",
+        domain="[('model_id', '=', model_id)]",
+        help="Fields returned when a request does not select any field.")
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        """This function is used to drop the cached read plans when a model
+        is exposed"""
+        records = super().create(vals_list)
+        _read_plans.clear()
+        return records
+
+    def write(self, vals):
+        """This function is used to drop the cached read plans when the
+        configuration of a model changes"""
+        res = super().write(vals)
+        _read_plans.clear()
+        return res
+
+    def unlink(self):
+        """This function is used to drop the cached read plans when a model
+        is no longer exposed"""
+        res = super().unlink()
+        _read_plans.clear()
+        return res
+
+    @api.model
+    def _get_read_plan(self, model_name):
+        """This function is used to get the read plan of a model from the
+        cache, compiling it when missing or expired"""
+        key = (self.env.cr.dbname, model_name)
+        cached = _read_plans.get(key)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+        plan = self._compile_read_plan(model_name)
+        _read_plans[key] = (time.monotonic() + READ_PLAN_CACHE_TTL, plan)
+        return plan
+
+    @api.model
+    def _compile_read_plan(self, model_name):
+        """This function is used to compile the configuration of a model
+        into a read plan: the allowed methods, the allowed and default
+        fields, and the date fields to convert to iso format. It returns
+        None when the model is not exposed"""
+        option = self.sudo().search(
+            [('model_id.model', '=', model_name)], limit=1)
+        if not option:
+            return None
+        model_fields = self.env[model_name]._fields
+        allowed = frozenset(option.allowed_field_ids.mapped('name'))
+        if allowed:
+            allowed |= {'id'}
+        return {
+            'model': model_name,
+            'is_get': option.is_get,
+            'is_post': option.is_post,
+            'is_put': option.is_put,
+            'is_delete': option.is_delete,
+            'allowed_fields': allowed,
+            'accessible_fields': allowed or frozenset(model_fields),
+            'default_fields': tuple(option.default_field_ids.mapped('name')),
+            'temporal_fields': frozenset(
+                name for name, field in model_fields.items()
+                if field.type in ('date', 'datetime')),
+        }
+
+    @api.model
+    def _check_fields(self, plan, field_names):
+        """This function is used to validate the fields read or written by a
+        request against the allowed fields of the read plan"""
+        if plan['allowed_fields'] and \
+                not plan['allowed_fields'].issuperset(field_names):
+            raise ValueError("Fields not allowed: %s" % ', '.join(
+                sorted(set(field_names) - plan['allowed_fields'])))
+        return list(field_names)
+
+    @api.model
+    def _check_field_path(self, plan, path):
+        """This function is used to validate a field path of a domain, e.g.
+        'patiente_id.nom_complet'. Every hop must be an accessible field,
+        and each relational hop must lead to a model exposed by
+        connection.api. It returns the read plan of the last model"""
+        names = path.split('.') if isinstance(path, str) else [None]
+        for index, name in enumerate(names):
+            if not plan or name not in plan['accessible_fields']:
+                raise ValueError("Invalid domain field %r" % (path,))
+            if index < len(names) - 1:
+                field = self.env[plan['model']]._fields[name]
+                if not field.relational:
+                    raise ValueError("Invalid domain field %r" % (path,))
+                plan = self._get_read_plan(field.comodel_name)
+        return plan
+
+    @api.model
+    def _check_domain(self, plan, domain):
+        """This function is used to validate a domain sent with a request.
+        Only the accessible fields of the model and of the exposed models it
+        leads to can be filtered on, and a ValueError is raised for anything
+        else"""
+        if not isinstance(domain, list):
+            raise ValueError("The domain must be a list")
+        checked = []
+        for term in domain:
+            if term in (expression.NOT_OPERATOR, expression.AND_OPERATOR,
+                        expression.OR_OPERATOR):
+                checked.append(term)
+                continue
+            if not isinstance(term, (list, tuple)) or len(term) != 3:
+                raise ValueError("Invalid domain term %r" % (term,))
+            field_name, operator, value = term
+            if operator not in expression.TERM_OPERATORS:
+                raise ValueError("Invalid domain operator %r" % (operator,))
+            if operator in ('any', 'not any'):
+                # The sub-domain applies to the model of the last hop
+                last_plan = self._check_field_path(plan, field_name)
+                field = self.env[last_plan['model']]._fields[
+                    field_name.rsplit('.', 1)[-1]]
+                sub_plan = field.relational and self._get_read_plan(
+                    field.comodel_name)
+                if not sub_plan:
+                    raise ValueError("Invalid domain field %r" % (
+                        field_name,))
+                value = self._check_domain(sub_plan, value)
+            else:
+                self._check_field_path(plan, field_name)
+            checked.append((field_name, operator, value))
+        return checked
+
+    @api.model
+    def _write_records(self, model, updates):
+        """This function is used to apply a list of [id, values] update
+        pairs on the given model, grouping the records that receive
+        identical values into one write. It returns the ids of the updated
+        records, or None when one of them does not exist"""
+        groups = {}
+        for rec_id, values in updates:
+            key = json.dumps(values, sort_keys=True)
+            groups.setdefault(key, (values, []))[1].append(int(rec_id))
+        rec_ids = [rec_id for values, ids in groups.values() for rec_id in ids]
+        if len(model.browse(rec_ids).exists()) != len(set(rec_ids)):
+            return None
+        for values, ids in groups.values():
+            model.browse(ids).write(values)
+        return rec_ids
+
+    @api.model
+    def _check_order(self, plan, order):
+        """This function is used to validate an order sent with a request,
+        e.g. 'date_consultation desc, id'"""
+        accessible = plan['accessible_fields']
+        for part in order.split(','):
+            spec = part.strip().split()
+            if not spec or len(spec) > 2 or spec[0] not in accessible or (
+                    len(spec) == 2 and spec[1].lower() not in ('asc', 'desc')):
+                raise ValueError("Invalid order %r" % (order,))
+        return order
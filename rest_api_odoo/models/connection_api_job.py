@@ -0,0 +1,147 @@
+# -*- coding:utf-8 -*-
+#############################################################################
+#
+#    Cybrosys Technologies Pvt. Ltd.
+#
+#    Copyright (C) 2024-TODAY Cybrosys Technologies(<https://www.cybrosys.com>)
+#    Author: Ayana KP (odoo@cybrosys.com)
+#
+#    You can modify it under the terms of the GNU LESSER
+#    GENERAL PUBLIC LICENSE (LGPL v3), Version 3.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU LESSER GENERAL PUBLIC LICENSE (LGPL v3) for more details.
+#
+#    You should have received a copy of the GNU LESSER GENERAL PUBLIC LICENSE
+#    (LGPL v3) along with this program.
+#    If not, see <http://www.gnu.org/licenses/>.
+#
+#############################################################################
+import json
+import logging
+from datetime import timedelta
+from odoo import api, fields, models
+from odoo.exceptions import MissingError
+
+_logger = logging.getLogger(__name__)
+
+JOB_BATCH_SIZE = 20
+# Days during which the done and failed jobs are kept for status requests
+JOB_RETENTION_DAYS = 7
+
+
+class ConnectionApiJob(models.Model):
+    """This class is used to store the POST and PUT requests sent in async
+    mode, which are executed later by a scheduled action instead of inside
+    the HTTP worker"""
+    _name = 'connection.api.job'
+    _description = 'Connection Rest Api Job'
+    _order = 'id'
+
+    user_id = fields.Many2one('res.users', string="User", required=True,
+                              ondelete='cascade', index=True,
+                              help="User on behalf of whom the job runs.")
+    model = fields.Char(string="Model", required=True)
+    method = fields.Selection([('POST', 'POST'), ('PUT', 'PUT')],
+                              string="Method", required=True)
+    payload = fields.Text(string="Payload", required=True,
+                          help="JSON values of the request.")
+    state = fields.Selection([('pending', 'Pending'),
+                              ('done', 'Done'),
+                              ('failed', 'Failed')],
+                             string="Status", default='pending',
+                             required=True, index=True)
+    result = fields.Text(string="Result",
+                         help="JSON ids of the created or updated records.")
+    error = fields.Text(string="Error")
+    date_done = fields.Datetime(string="Done On")
+
+    @api.model
+    def enqueue(self, model, method, payload):
+        """This function is used to store an async request and to wake the
+        scheduled action up. It returns the new job"""
+        job = self.sudo().create({
+            'user_id': self.env.uid,
+            'model': model,
+            'method': method,
+            'payload': json.dumps(payload),
+        })
+        self.env.ref(
+            'rest_api_odoo.ir_cron_connection_api_job').sudo()._trigger()
+        return job
+
+    def get_status(self):
+        """This function is used to get the status of the job to return to
+        the client"""
+        self.ensure_one()
+        return {
+            'job': self.id,
+            'status': self.state,
+            'result': json.loads(self.result) if self.result else None,
+            'error': self.error or None,
+        }
+
+    def _execute(self):
+        """This function is used to run the job as its user. POST creates
+        all the values in one batch and PUT writes the [id, values] pairs
+        through connection.api, like the synchronous requests"""
+        self.ensure_one()
+        model = self.env[self.model].with_user(self.user_id)
+        payload = json.loads(self.payload)
+        if self.method == 'POST':
+            return model.create(payload['values']).ids
+        rec_ids = self.env['connection.api']._write_records(
+            model, payload['updates'])
+        if rec_ids is None:
+            raise MissingError("Resource not found")
+        return rec_ids
+
+    @api.model
+    def _purge_jobs(self):
+        """This function is used to delete the done and failed jobs older
+        than JOB_RETENTION_DAYS"""
+        limit_date = fields.Datetime.now() - timedelta(days=JOB_RETENTION_DAYS)
+        self.env.cr.execute("""
+            DELETE FROM connection_api_job
+            WHERE state IN ('done', 'failed') AND date_done < %s
+        """, [limit_date])
+        if self.env.cr.rowcount:
+            _logger.info("Rest API: %s old jobs purged", self.env.cr.rowcount)
+
+    @api.model
+    def _cron_process_jobs(self, limit=JOB_BATCH_SIZE):
+        """This function is used by the scheduled action to process the
+        pending jobs. Each job is locked so that several workers can process
+        the queue concurrently, and committed on its own. The old done and
+        failed jobs are purged first"""
+        self._purge_jobs()
+        for _i in range(limit):
+            self.env.cr.execute("""
+                SELECT id FROM connection_api_job
+                WHERE state = 'pending'
+                ORDER BY id
+                LIMIT 1
+                FOR UPDATE SKIP LOCKED
+            """)
+            row = self.env.cr.fetchone()
+            if not row:
+                break
+            job = self.browse(row[0])
+            try:
+                with self.env.cr.savepoint():
+                    rec_ids = job._execute()
+                job.write({'state': 'done',
+                           'result': json.dumps(rec_ids),
+                           'date_done': fields.Datetime.now()})
+            except Exception as error:
+                _logger.warning("Rest API job %s failed: %s", job.id, error)
+                job.write({'state': 'failed',
+                           'error': str(error),
+                           'date_done': fields.Datetime.now()})
+            self.env.cr.commit()
+        else:
+            # The batch is full, more jobs may be pending
+            self.env.ref(
+                'rest_api_odoo.ir_cron_connection_api_job').sudo()._trigger()
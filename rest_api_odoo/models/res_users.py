@@ -19,8 +19,33 @@
 #    If not, see <http://www.gnu.org/licenses/>.
 #
 #############################################################################
+import base64
+import json
+import time
 import uuid
-from odoo import fields, models
+from odoo import api, fields, models
+from odoo.tools import consteq
+from odoo.tools.lru import LRU
+from odoo.tools.misc import hmac
+
+# Maps (database, api-key) to (expiry, uid, context). The cache is bounded
+# and every entry expires, so a key rotated or a user archived from another
+# worker is refused after at most API_KEY_CACHE_TTL seconds.
+API_KEY_CACHE_SIZE = 1024
+API_KEY_CACHE_TTL = 300
+_api_key_cache = LRU(API_KEY_CACHE_SIZE)
+
+# Lifetime in seconds of the bearer tokens issued by /odoo_connect
+API_TOKEN_LIFETIME = 3600
+API_TOKEN_SCOPE = 'rest_api_odoo.token'
+
+
+def _forget_api_key(cache_key):
+    """Drop a cached api-key, if present"""
+    try:
+        del _api_key_cache[cache_key]
+    except KeyError:
+        pass
 
 
 class ResUsers(models.Model):
@@ -42,3 +67,93 @@ class ResUsers(models.Model):
         else:
             key = users.api_key
         return key
+
+    @api.model
+    def _resolve_api_key(self, api_key):
+        """This function is used to resolve an api-key to the uid and the
+        context of its user, without searching res.users on every request"""
+        if not api_key:
+            return None
+        cache_key = (self.env.cr.dbname, api_key)
+        cached = _api_key_cache.get(cache_key)
+        if cached and cached[0] > time.monotonic():
+            return cached[1], cached[2]
+        user = self.sudo().search([('api_key', '=', api_key)], limit=1)
+        if not user:
+            _forget_api_key(cache_key)
+            return None
+        context = dict(user.context_get())
+        _api_key_cache[cache_key] = (
+            time.monotonic() + API_KEY_CACHE_TTL, user.id, context)
+        return user.id, context
+
+    def _invalidate_api_key_cache(self):
+        """This function is used to drop the cached api-keys of the users"""
+        for user in self.sudo():
+            if user.api_key:
+                _forget_api_key((self.env.cr.dbname, user.api_key))
+
+    def write(self, vals):
+        """This function is used to forget the cached api-key when the key
+        is rotated or the user is archived"""
+        if {'api_key', 'active', 'lang', 'tz'} & set(vals):
+            self._invalidate_api_key_cache()
+        return super().write(vals)
+
+    def unlink(self):
+        """This function is used to forget the cached api-key of deleted
+        users"""
+        self._invalidate_api_key_cache()
+        return super().unlink()
+
+    def _api_token_material(self):
+        """This function is used to get the revocable material bound to the
+        bearer tokens of the user: the session token derived from its login,
+        password and active flag, so that changing the password or archiving
+        the user revokes its tokens"""
+        self.ensure_one()
+        return self._compute_session_token(
+            '%s:%s' % (API_TOKEN_SCOPE, self.id)) or ''
+
+    def generate_api_token(self):
+        """This function is used to issue a signed bearer token for the user.
+        The token carries the uid, the language, the timezone and the expiry
+        date, signed with the database secret and the session token material
+        of the user, so that it can be verified without any session"""
+        self.ensure_one()
+        payload = base64.urlsafe_b64encode(json.dumps({
+            'uid': self.id,
+            'lang': self.lang,
+            'tz': self.tz,
+            'exp': int(time.time()) + API_TOKEN_LIFETIME,
+        }).encode()).decode()
+        signature = hmac(self.env(su=True), API_TOKEN_SCOPE, '%s.%s' % (
+            payload, self._api_token_material()))
+        return '%s.%s' % (payload, signature)
+
+    @api.model
+    def _verify_api_token(self, token):
+        """This function is used to verify a bearer token in constant time
+        and to return the uid and the context of its user, or None when the
+        token is invalid, expired, or its user archived or its password
+        changed since the token was issued"""
+        payload, _sep, signature = (token or '').partition('.')
+        if not payload or not signature:
+            return None
+        try:
+            values = json.loads(base64.urlsafe_b64decode(payload))
+            user = self.sudo().browse(int(values['uid']))
+            expiry = float(values['exp'])
+        except (KeyError, TypeError, ValueError):
+            return None
+        # the signing material depends on the user, which must exist first;
+        # the other claims are only trusted once the signature is checked
+        if not user.exists() or not user.active:
+            return None
+        expected = hmac(self.env(su=True), API_TOKEN_SCOPE, '%s.%s' % (
+            payload, user._api_token_material()))
+        if not consteq(expected, signature) or expiry < time.time():
+            return None
+        context = {key: values[key] for key in ('lang', 'tz')
+                   if values.get(key)}
+        return user.id, context
@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 {
     'name': 'SALAMET - Surveillance et Alerte Maternité',
-    'version': '18.0.1.0.0',
+    'version': '18.0.1.0.1',
     'category': 'Healthcare',
     'summary': 'Système de surveillance et d\'alerte pour le suivi des grossesses à risque',
     'description': '''
@@ -27,6 +27,7 @@
     'depends': [
         'base',
         'web',
+        'bus',
         'mail',
         'calendar',
         'hr',
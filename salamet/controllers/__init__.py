@@ -7,4 +7,5 @@ from . import grossesses
 from . import consultations
 from . import notifications
 from . import bilans
+from . import sync
 #from . import rest_api_extension
\ No newline at end of file
@@ -4,6 +4,7 @@ from odoo import http
 from odoo.http import request
 from odoo.exceptions import ValidationError, AccessError
 from datetime import datetime, timedelta
+from dateutil.relativedelta import relativedelta
 import json
 import logging
 
@@ -305,29 +306,25 @@ class SalametBilansController(http.Controller):
 
     def _generer_stats_mensuelles(self):
         """Générer les statistiques des 12 derniers mois"""
-        stats = []
-        for i in range(12):
-            date_fin = datetime.now().replace(day=1) - timedelta(days=1)
-            date_debut = (date_fin.replace(day=1) - timedelta(days=30*i)).replace(day=1)
-            date_fin = (date_debut + timedelta(days=32)).replace(day=1) - timedelta(days=1)
-            
-            stats.append({
-                'mois': date_debut.strftime('%Y-%m'),
-                'patientes': request.env['salamet.patiente'].search_count([
-                    ('create_date', '>=', date_debut.strftime('%Y-%m-%d')),
-                    ('create_date', '<=', date_fin.strftime('%Y-%m-%d 23:59:59'))
-                ]),
-                'grossesses': request.env['salamet.grossesse'].search_count([
-                    ('date_debut', '>=', date_debut),
-                    ('date_debut', '<=', date_fin)
-                ]),
-                'consultations': request.env['salamet.consultation'].search_count([
-                    ('date_consultation', '>=', date_debut),
-                    ('date_consultation', '<=', date_fin)
-                ])
-            })
-        
-        return list(reversed(stats))
+        Dashboard = request.env['salamet.dashboard']
+        date_fin = datetime.now().date().replace(day=1) - timedelta(days=1)
+        date_debut = date_fin.replace(day=1) - relativedelta(months=11)
+
+        series = {
+            cle: dict(Dashboard._serie_temporelle(model, champ, 'month', date_debut, date_fin))
+            for cle, model, champ in [
+                ('patientes', 'salamet.patiente', 'create_date'),
+                ('grossesses', 'salamet.grossesse', 'date_debut'),
+                ('consultations', 'salamet.consultation', 'date_consultation'),
+            ]
+        }
+
+        return [{
+            'mois': mois.strftime('%Y-%m'),
+            'patientes': series['patientes'][mois],
+            'grossesses': series['grossesses'][mois],
+            'consultations': series['consultations'][mois],
+        } for mois in sorted(series['patientes'])]
 
     def _generer_stats_actuelles(self):
         """Générer les statistiques actuelles"""
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+
+from odoo.http import request
+from odoo.tools import lazy_property
+
+
+class SalametRequestContext:
+    """Profil de l'utilisateur courant, résolu une seule fois par requête.
+
+    Le rôle et les IDs des profils liés viennent du cache des rôles de
+    res.users ; les enregistrements et l'ensemble des patientes accessibles
+    sont calculés à la première lecture puis conservés jusqu'à la fin de la
+    requête.
+    """
+
+    def __init__(self, env):
+        self.env = env
+        self.user = env.user
+
+    @lazy_property
+    def role_info(self):
+        return self.user._get_salamet_role_info()
+
+    @property
+    def role(self):
+        return self.role_info['role']
+
+    @property
+    def app_role(self):
+        return self.role_info['app_role']
+
+    @lazy_property
+    def medecin(self):
+        """Profil salamet.medecin de l'utilisateur (vide si aucun)"""
+        return self.env['salamet.medecin'].browse(self.role_info['medecin_id'])
+
+    @lazy_property
+    def patiente(self):
+        """Profil salamet.patiente de l'utilisateur (vide si aucun)"""
+        return self.env['salamet.patiente'].browse(self.role_info['patiente_id'])
+
+    @lazy_property
+    def accessible_patiente_ids(self):
+        """IDs des patientes actives suivies par l'utilisateur, None si l'accès
+        n'est pas restreint à un ensemble de patientes (administrateur,
+        observateur, utilisateur sans profil)"""
+        if self.medecin:
+            # Patientes actives seulement, comme la recherche ORM
+            self.env['salamet.patiente'].flush_model(['active'])
+            self.env.cr.execute(
+                """SELECT a.patiente_id
+                     FROM salamet_patiente_access a
+                     JOIN salamet_patiente p ON p.id = a.patiente_id
+                    WHERE a.user_id = %s AND p.active""",
+                [self.user.id],
+            )
+            return frozenset(row[0] for row in self.env.cr.fetchall())
+        if self.patiente:
+            return frozenset(self.patiente.ids)
+        return None
+
+    def can_access_patiente(self, patiente_id):
+        """Vérifier si la patiente fait partie du périmètre de l'utilisateur
+        (une patiente archivée reste consultable par ses médecins)"""
+        accessible = self.accessible_patiente_ids
+        if accessible is None or patiente_id in accessible:
+            return True
+        if self.medecin:
+            self.env.cr.execute(
+                "SELECT 1 FROM salamet_patiente_access WHERE user_id = %s AND patiente_id = %s",
+                [self.user.id, patiente_id],
+            )
+            return bool(self.env.cr.fetchone())
+        return False
+
+
+def get_salamet_context():
+    """Contexte SALAMET de la requête courante (créé au premier appel)"""
+    context = getattr(request, '_salamet_context', None)
+    if context is None or context.env.uid != request.env.uid:
+        context = request._salamet_context = SalametRequestContext(request.env)
+    return context
@@ -1,11 +1,67 @@
 # -*- coding: utf-8 -*-
+import gzip
 import json
 import logging
 from odoo import http
 from odoo.http import request, Response
+from .context import get_salamet_context
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
 
 _logger = logging.getLogger(__name__)
 
+# Taille (en octets) à partir de laquelle une réponse JSON est compressée
+COMPRESSION_MIN_SIZE = 1024
+
+
+def _drop_nulls(value):
+    """Supprimer récursivement les valeurs nulles (mode compact)"""
+    if isinstance(value, dict):
+        return {k: _drop_nulls(v) for k, v in value.items() if v is not None}
+    if isinstance(value, (list, tuple)):
+        return [_drop_nulls(v) for v in value]
+    return value
+
+
+def make_json_response(payload, status=200, headers=None, default=None):
+    """Construire une réponse JSON, compressée en brotli ou gzip selon
+    l'en-tête Accept-Encoding lorsqu'elle dépasse COMPRESSION_MIN_SIZE.
+
+    Avec le paramètre ``compact=1``, les valeurs nulles sont omises et le
+    JSON est sérialisé sans espaces.
+    """
+    httprequest = request.httprequest
+    if httprequest.args.get('compact') in ('1', 'true'):
+        body = json.dumps(_drop_nulls(payload), default=default,
+                          ensure_ascii=False, separators=(',', ':'))
+    else:
+        body = json.dumps(payload, default=default, ensure_ascii=False)
+    body = body.encode('utf-8')
+
+    headers = dict(headers or {})
+    if len(body) >= COMPRESSION_MIN_SIZE:
+        accepted = httprequest.accept_encodings
+        if brotli and accepted['br']:
+            body = brotli.compress(body)
+            headers['Content-Encoding'] = 'br'
+        elif accepted['gzip']:
+            body = gzip.compress(body, compresslevel=6)
+            headers['Content-Encoding'] = 'gzip'
+        headers['Vary'] = 'Accept-Encoding'
+
+    return Response(body, status=status, mimetype='application/json', headers=headers)
+
+
+CORS_HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Methods': 'GET, POST, PUT, DELETE, OPTIONS',
+    'Access-Control-Allow-Headers': 'Content-Type, Authorization, Cookie, X-Openerp-Session-Id',
+    'Access-Control-Allow-Credentials': 'true',
+}
+
 
 class SalametAPIController(http.Controller):
     """Contrôleur de base pour l'API SALAMET"""
@@ -20,17 +76,7 @@ class SalametAPIController(http.Controller):
         if data is not None:
             response_data["data"] = data
         
-        return Response(
-            json.dumps(response_data, default=str, ensure_ascii=False),
-            status=status,
-            mimetype='application/json',
-            headers={
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'GET, POST, PUT, DELETE, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type, Authorization, Cookie, X-Openerp-Session-Id',
-                'Access-Control-Allow-Credentials': 'true',
-            }
-        )
+        return make_json_response(response_data, status=status, headers=CORS_HEADERS, default=str)
 
     def _error_response(self, message, status=400, error_code=None):
         """Retourne une réponse d'erreur JSON"""
@@ -42,17 +88,7 @@ class SalametAPIController(http.Controller):
         
         _logger.error(f"API Error: {message}")
         
-        return Response(
-            json.dumps(error_data, ensure_ascii=False),
-            status=status,
-            mimetype='application/json',
-            headers={
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'GET, POST, PUT, DELETE, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type, Authorization, Cookie, X-Openerp-Session-Id',
-                'Access-Control-Allow-Credentials': 'true',
-            }
-        )
+        return make_json_response(error_data, status=status, headers=CORS_HEADERS)
 
     def _get_user_role(self, user=None):
         """
@@ -62,6 +98,8 @@ class SalametAPIController(http.Controller):
             dict: {
                 'role': 'medecin_senior' | 'medecin_resident' | 'patiente' | 'admin' | 'readonly',
                 'role_name': 'Médecin Senior' | 'Médecin Résident' | 'Patiente' | 'Administrateur' | 'Observateur',
+                'medecin_id': int | False,
+                'patiente_id': int | False,
                 'permissions': {
                     'can_create': bool,
                     'can_edit': bool,
@@ -70,82 +108,10 @@ class SalametAPIController(http.Controller):
                 }
             }
         """
-        if user is None:
-            user = request.env.user
-        
-        role_info = {
-            'role': 'user',
-            'role_name': 'Utilisateur',
-            'permissions': {
-                'can_create': False,
-                'can_edit': False,
-                'can_delete': False,
-                'can_view_all': False
-            }
-        }
-        
-        # Vérification par ordre de priorité (du plus élevé au plus bas)
-        if user.has_group('salamet.group_salamet_admin'):
-            role_info.update({
-                'role': 'admin',
-                'role_name': 'Administrateur',
-                'permissions': {
-                    'can_create': True,
-                    'can_edit': True,
-                    'can_delete': True,
-                    'can_view_all': True
-                }
-            })
-        
-        elif user.has_group('salamet.group_salamet_medecin_senior'):
-            role_info.update({
-                'role': 'medecin_senior',
-                'role_name': 'Médecin Senior',
-                'permissions': {
-                    'can_create': True,
-                    'can_edit': True,
-                    'can_delete': False,
-                    'can_view_all': False
-                }
-            })
-        
-        elif user.has_group('salamet.group_salamet_medecin_resident'):
-            role_info.update({
-                'role': 'medecin_resident',
-                'role_name': 'Médecin Résident',
-                'permissions': {
-                    'can_create': True,
-                    'can_edit': True,
-                    'can_delete': False,
-                    'can_view_all': False
-                }
-            })
-        
-        elif user.has_group('salamet.group_salamet_patiente'):
-            role_info.update({
-                'role': 'patiente',
-                'role_name': 'Patiente',
-                'permissions': {
-                    'can_create': False,
-                    'can_edit': False,
-                    'can_delete': False,
-                    'can_view_all': False
-                }
-            })
-        
-        elif user.has_group('salamet.group_salamet_readonly'):
-            role_info.update({
-                'role': 'readonly',
-                'role_name': 'Observateur',
-                'permissions': {
-                    'can_create': False,
-                    'can_edit': False,
-                    'can_delete': False,
-                    'can_view_all': True
-                }
-            })
-        
-        return role_info
+        if user is None or user == request.env.user:
+            return get_salamet_context().role_info
+
+        return user._get_salamet_role_info()
 
     def _get_user_profile_data(self, user):
         """
@@ -158,10 +124,8 @@ class SalametAPIController(http.Controller):
         profile_data = None
         
         if role_info['role'] in ['medecin_senior', 'medecin_resident']:
-            # Rechercher le profil médecin
-            medecin = request.env['salamet.medecin'].sudo().search([
-                ('user_id', '=', user.id)
-            ], limit=1)
+            # Profil médecin issu du cache des rôles
+            medecin = request.env['salamet.medecin'].sudo().browse(role_info['medecin_id'])
             
             if medecin:
                 profile_data = {
@@ -174,10 +138,8 @@ class SalametAPIController(http.Controller):
                 }
         
         elif role_info['role'] == 'patiente':
-            # Rechercher le profil patiente
-            patiente = request.env['salamet.patiente'].sudo().search([
-                ('user_id', '=', user.id)
-            ], limit=1)
+            # Profil patiente issu du cache des rôles
+            patiente = request.env['salamet.patiente'].sudo().browse(role_info['patiente_id'])
             
             if patiente:
                 profile_data = {
@@ -1,15 +1,45 @@
 # -*- coding: utf-8 -*-
 # salamet/controllers/patientes.py - VERSION COMPLÈTE AMÉLIORÉE
-from odoo import http
+from odoo import fields, http
 from odoo.http import request
 from odoo.exceptions import ValidationError, AccessError, UserError
+import hashlib
 import json
 import logging
+import base64
 from datetime import datetime, date
 from werkzeug.exceptions import BadRequest
+from .context import get_salamet_context
+from .main import make_json_response
 
 _logger = logging.getLogger(__name__)
 
+# Champs lus en une seule requête pour le résumé d'une patiente
+PATIENTE_SUMMARY_FIELDS = [
+    'name', 'nom_complet', 'date_naissance', 'age', 'telephone', 'email',
+    'adresse', 'groupe_sanguin', 'est_enceinte', 'niveau_risque_global',
+    'consanguinite', 'grossesse_actuelle_id', 'medecin_ids', 'nombre_grossesses',
+    'active', 'create_date', 'write_date',
+]
+
+GROSSESSE_SUMMARY_FIELDS = [
+    'date_debut', 'date_prevue_accouchement', 'niveau_risque', 'state',
+    'medecin_referent_id', 'terme_actuel',
+]
+
+CONSULTATION_DETAIL_FIELDS = [
+    'date_consultation', 'type_consultation', 'medecin_id', 'motif_consultation',
+    'diagnostic', 'prescriptions', 'observations', 'grossesse_id', 'state',
+]
+
+# Nombre d'éléments renvoyés pour les sous-listes du dossier patiente
+DETAIL_CONSULTATIONS_LIMIT = 5
+DETAIL_EXAMENS_LIMIT = 10
+DETAIL_RDV_LIMIT = 5
+
+# Au-delà de ce nombre, le total de la pagination par curseur est approximé
+KEYSET_TOTAL_CAP = 1000
+
 class SalametPatientesController(http.Controller):
     """Contrôleur pour la gestion des patientes SALAMET"""
 
@@ -30,7 +60,20 @@ class SalametPatientesController(http.Controller):
 
             # Construction du domain de recherche
             domain = self._build_search_domain(medecin_id, params)
-            
+
+            # Requête conditionnelle : rien à renvoyer si la liste n'a pas changé
+            etag = self._compute_etag(
+                'medecin', medecin_id, params,
+                self._aggregate_validator('salamet.patiente', domain),
+                self._aggregate_validator('salamet.grossesse', [('patiente_id', 'any', domain)]),
+                self._aggregate_validator('salamet.consultation', [('patiente_id', 'any', domain)]),
+                # Noms et spécialités des médecins affichés (medecin_ids)
+                self._aggregate_validator('salamet.medecin', [('patiente_ids', 'any', domain)]),
+                fields.Date.context_today(request.env.user),
+            )
+            if self._etag_matches(etag, kwargs):
+                return {'success': True, 'not_modified': True, 'etag': etag}
+
             # Recherche avec pagination
             offset = (params['page'] - 1) * params['limit']
             patientes = request.env['salamet.patiente'].search(
@@ -44,17 +87,11 @@ class SalametPatientesController(http.Controller):
             _logger.info(f"Trouvé {len(patientes)} patientes sur {total} total")
 
             # Formatage des données
-            data = []
-            for patiente in patientes:
-                try:
-                    patiente_data = self._format_patiente_summary(patiente)
-                    data.append(patiente_data)
-                except Exception as e:
-                    _logger.error(f"Erreur formatage patiente {patiente.id}: {str(e)}")
-                    continue
+            data = self._format_patientes_summaries(patientes)
 
             response = {
                 'success': True,
+                'etag': etag,
                 'data': data,
                 'total': total,
                 'page': params['page'],
@@ -77,6 +114,62 @@ class SalametPatientesController(http.Controller):
             _logger.error(f"Erreur API patientes par médecin {medecin_id}: {str(e)}")
             return {'success': False, 'error': f'Erreur interne: {str(e)}'}
 
+    @http.route('/salamet/patientes/medecin/<int:medecin_id>/page', type='json', auth='user', methods=['GET', 'POST'])
+    def api_patientes_by_medecin_keyset(self, medecin_id, **kwargs):
+        """API paginée par curseur (nom_complet, id) : le coût d'une page
+        ne dépend pas de sa profondeur dans la liste"""
+        try:
+            self._check_access()
+            medecin = self._verify_medecin_access(medecin_id)
+
+            params = self._extract_request_params(kwargs)
+            domain = self._build_search_domain(medecin_id, params)
+            Patiente = request.env['salamet.patiente']
+
+            # Total optionnel, compté au plus jusqu'à KEYSET_TOTAL_CAP
+            total = None
+            if params['with_total']:
+                total = Patiente.search_count(domain, limit=KEYSET_TOTAL_CAP + 1)
+
+            keyset_domain = domain + self._keyset_domain(params['cursor'])
+            patientes = Patiente.search(
+                keyset_domain,
+                limit=params['limit'] + 1,
+                order='nom_complet asc nulls last, id'
+            )
+            has_more = len(patientes) > params['limit']
+            patientes = patientes[:params['limit']]
+
+            next_cursor = None
+            if has_more:
+                last = patientes[-1]
+                next_cursor = self._encode_cursor(last.nom_complet, last.id)
+
+            return {
+                'success': True,
+                'data': self._format_patientes_summaries(patientes),
+                'next_cursor': next_cursor,
+                'has_more': has_more,
+                'limit': params['limit'],
+                'total': min(total, KEYSET_TOTAL_CAP) if total is not None else None,
+                'total_is_exact': total is not None and total <= KEYSET_TOTAL_CAP,
+                'medecin': {
+                    'id': medecin.id,
+                    'nom': medecin.nom_complet or '',
+                    'specialite': medecin.specialite or '',
+                    'statut': medecin.statut or ''
+                }
+            }
+
+        except ValidationError as e:
+            return {'success': False, 'error': f'Erreur de validation: {str(e)}'}
+        except AccessError as e:
+            _logger.warning(f"Accès refusé pour médecin {medecin_id}: {str(e)}")
+            return {'success': False, 'error': f'Accès refusé: {str(e)}'}
+        except Exception as e:
+            _logger.error(f"Erreur API patientes paginées médecin {medecin_id}: {str(e)}")
+            return {'success': False, 'error': f'Erreur interne: {str(e)}'}
+
     @http.route('/salamet/patientes/<int:patiente_id>/detail', type='json', auth='user', methods=['GET', 'POST'])
     def api_get_patiente_detail(self, patiente_id, **kwargs):
         """API pour récupérer les détails complets d'une patiente"""
@@ -86,12 +179,26 @@ class SalametPatientesController(http.Controller):
             # Vérifier l'accès à cette patiente
             patiente = self._verify_patiente_access(patiente_id)
             
+            # Requête conditionnelle : rien à renvoyer si le dossier n'a pas changé.
+            # La date du jour en fait partie (âge, rendez-vous à venir)
+            etag = self._compute_etag(
+                'detail', patiente_id,
+                fields.Date.context_today(request.env.user),
+                self._aggregate_validator('salamet.patiente', [('id', '=', patiente_id)]),
+                *(self._aggregate_validator(model, [('patiente_id', '=', patiente_id)])
+                  for model in ('salamet.grossesse', 'salamet.consultation', 'salamet.notification',
+                                'salamet.serologie', 'salamet.examen.hematologie',
+                                'salamet.examen.biochimie'))
+            )
+            if self._etag_matches(etag, kwargs):
+                return {'success': True, 'not_modified': True, 'etag': etag}
+
             _logger.info(f"Récupération détails patiente {patiente_id}")
 
             # Formatage complet des données
             data = self._format_patiente_detail(patiente)
 
-            return {'success': True, 'data': data}
+            return {'success': True, 'etag': etag, 'data': data}
 
         except AccessError as e:
             _logger.warning(f"Accès refusé pour patiente {patiente_id}: {str(e)}")
@@ -285,17 +392,6 @@ class SalametPatientesController(http.Controller):
             # Construction du domain
             domain = [('active', '=', True)]
             
-            # Recherche textuelle
-            if search_term:
-                domain.extend([
-                    '|', '|', '|', '|',
-                    ('name', 'ilike', search_term),
-                    ('nom_complet', 'ilike', search_term),
-                    ('telephone', 'ilike', search_term),
-                    ('email', 'ilike', search_term),
-                    ('numero_securite_sociale', 'ilike', search_term)
-                ])
-            
             # Appliquer les filtres
             if isinstance(filters, dict):
                 if filters.get('medecin_id'):
@@ -305,11 +401,11 @@ class SalametPatientesController(http.Controller):
                 if filters.get('niveau_risque'):
                     domain.append(('niveau_risque_global', '=', filters['niveau_risque']))
             
-            # Recherche
-            patientes = request.env['salamet.patiente'].search(domain, limit=limit, order='nom_complet')
+            # Recherche classée (préfixe puis similarité)
+            patientes = request.env['salamet.patiente'].search_ranked(search_term, domain, limit=limit)
             
             # Formatage
-            data = [self._format_patiente_summary(p) for p in patientes]
+            data = self._format_patientes_summaries(patientes)
             
             return {
                 'success': True,
@@ -322,6 +418,24 @@ class SalametPatientesController(http.Controller):
             _logger.error(f"Erreur recherche patientes: {str(e)}")
             return {'success': False, 'error': str(e)}
 
+    @http.route('/salamet/patientes/suggest', type='json', auth='user', methods=['GET', 'POST'])
+    def api_suggest_patientes(self, q='', limit=8, **kwargs):
+        """API de saisie semi-automatique : id, nom et badges uniquement,
+        servis depuis le cache des préfixes récents de l'utilisateur"""
+        try:
+            self._check_access()
+
+            limit = min(max(1, int(limit or 8)), 20)
+            suggestions = request.env['salamet.patiente']._suggest(q or '', limit=limit)
+
+            return {'success': True, 'data': suggestions, 'query': q or ''}
+
+        except AccessError as e:
+            return {'success': False, 'error': f'Accès refusé: {str(e)}'}
+        except Exception as e:
+            _logger.error(f"Erreur suggestions patientes: {str(e)}")
+            return {'success': False, 'error': str(e)}
+
     @http.route('/salamet/patientes/stats', type='json', auth='user', methods=['GET', 'POST'])
     def api_patientes_stats(self, **kwargs):
         """API pour les statistiques des patientes"""
@@ -349,7 +463,7 @@ class SalametPatientesController(http.Controller):
             current_medecin = self._get_current_medecin()
             if current_medecin:
                 medecin_stats = {
-                    'mes_patientes': len(current_medecin.patiente_ids),
+                    'mes_patientes': len(get_salamet_context().accessible_patiente_ids),
                     'mes_patientes_enceintes': len(current_medecin.patiente_ids.filtered('est_enceinte')),
                     'mes_grossesses_referent': len(current_medecin.grossesse_referent_ids)
                 }
@@ -479,22 +593,45 @@ class SalametPatientesController(http.Controller):
             raise AccessError(f"Accès refusé pour {action} la patiente {patiente.nom_complet}")
         
         # Vérifier si le médecin connecté peut accéder à cette patiente
-        current_medecin = self._get_current_medecin()
-        if current_medecin:
-            if current_medecin.id not in patiente.medecin_ids.ids:
-                raise AccessError(f"Cette patiente n'est pas assignée à votre suivi")
+        context = get_salamet_context()
+        if context.medecin and not context.can_access_patiente(patiente.id):
+            raise AccessError(f"Cette patiente n'est pas assignée à votre suivi")
         
         return patiente
 
     def _get_current_medecin(self):
-        """Récupérer le médecin correspondant à l'utilisateur connecté"""
-        try:
-            current_user = request.env.user
-            medecin = request.env['salamet.medecin'].search([('user_id', '=', current_user.id)], limit=1)
-            return medecin if medecin.exists() else None
-        except Exception as e:
-            _logger.warning(f"Erreur récupération médecin courant: {str(e)}")
-            return None
+        """Récupérer le médecin correspondant à l'utilisateur connecté
+        (résolu une seule fois par requête)"""
+        return get_salamet_context().medecin or None
+
+    def _aggregate_validator(self, model_name, domain):
+        """Nombre d'enregistrements et dernière date de modification du
+        domaine, calculés en une seule requête agrégée"""
+        [(count, last_write)] = request.env[model_name]._read_group(
+            domain, aggregates=['__count', 'write_date:max'])
+        return [count, str(last_write)]
+
+    def _compute_etag(self, *parts):
+        """Calculer l'ETag d'une réponse à partir de ses validateurs et
+        l'ajouter aux en-têtes de la réponse.
+
+        L'ETag est faible : il désigne le même contenu qu'il soit transmis
+        compressé ou non (Vary: Accept-Encoding).
+        """
+        digest = hashlib.sha1(json.dumps(
+            [request.env.uid, request.env.lang, *parts], default=str
+        ).encode()).hexdigest()
+        etag = f'W/"{digest}"'
+        request.future_response.headers['ETag'] = etag
+        request.future_response.headers['Vary'] = 'Accept-Encoding'
+        return etag
+
+    def _etag_matches(self, etag, kwargs):
+        """Vérifier si le client possède déjà cette version (paramètre
+        ``etag`` ou en-tête If-None-Match, comparaison faible)"""
+        if kwargs.get('etag') == etag:
+            return True
+        return request.httprequest.if_none_match.contains_weak(etag[3:-1])
 
     def _extract_request_params(self, kwargs):
         """Extraire et valider les paramètres de requête"""
@@ -504,11 +641,15 @@ class SalametPatientesController(http.Controller):
             filters = json_data.get('filters', {})
             page = int(json_data.get('page', 1))
             limit = int(json_data.get('limit', 20))
+            cursor = json_data.get('cursor')
+            with_total = bool(json_data.get('with_total'))
         else:
             search = kwargs.get('search', '')
             filters = kwargs.get('filters', {})
             page = int(kwargs.get('page', 1))
             limit = int(kwargs.get('limit', 20))
+            cursor = kwargs.get('cursor')
+            with_total = bool(kwargs.get('with_total'))
         
         # Validation
         page = max(1, page)
@@ -518,9 +659,36 @@ class SalametPatientesController(http.Controller):
             'search': search,
             'filters': filters,
             'page': page,
-            'limit': limit
+            'limit': limit,
+            'cursor': cursor or None,
+            'with_total': with_total
         }
 
+    def _encode_cursor(self, nom_complet, record_id):
+        """Encoder la position (nom_complet, id) du dernier élément d'une page"""
+        payload = json.dumps([nom_complet or None, record_id]).encode()
+        return base64.urlsafe_b64encode(payload).decode()
+
+    def _keyset_domain(self, cursor):
+        """Domaine des patientes situées après le curseur dans l'ordre
+        (nom_complet NULLS LAST, id)"""
+        if not cursor:
+            return []
+        try:
+            nom_complet, record_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            record_id = int(record_id)
+        except (ValueError, TypeError, AttributeError):
+            raise ValidationError("Curseur de pagination invalide")
+        if not nom_complet:
+            # Dernier élément sans nom : seules restent les patientes sans nom suivantes
+            return [('nom_complet', '=', False), ('id', '>', record_id)]
+        return [
+            '|', '|',
+            ('nom_complet', '>', nom_complet),
+            '&', ('nom_complet', '=', nom_complet), ('id', '>', record_id),
+            ('nom_complet', '=', False),
+        ]
+
     def _build_search_domain(self, medecin_id, params):
         """Construire le domain de recherche"""
         domain = [
@@ -528,17 +696,9 @@ class SalametPatientesController(http.Controller):
             ('medecin_ids', 'in', [medecin_id])
         ]
         
-        # Recherche textuelle
+        # Recherche textuelle (texte normalisé indexé en trigrammes)
         if params['search']:
-            search_term = params['search']
-            domain.extend([
-                '|', '|', '|', '|',
-                ('name', 'ilike', search_term),
-                ('nom_complet', 'ilike', search_term),
-                ('telephone', 'ilike', search_term),
-                ('email', 'ilike', search_term),
-                ('numero_securite_sociale', 'ilike', search_term)
-            ])
+            domain.extend(request.env['salamet.patiente']._get_search_domain(params['search']))
         
         # Filtres spécifiques
         filters = params['filters']
@@ -647,258 +807,319 @@ class SalametPatientesController(http.Controller):
 
     def _format_patiente_summary(self, patiente):
         """Formater les données résumées d'une patiente"""
+        return self._format_patientes_summaries(patiente)[0]
+
+    def _format_patientes_summaries(self, patientes, stats=None):
+        """Formater les résumés d'un ensemble de patientes avec un nombre
+        fixe de requêtes, quel que soit le nombre de patientes"""
+        if not patientes:
+            return []
         try:
-            # Récupérer la grossesse actuelle
-            grossesse_actuelle = None
-            if hasattr(patiente, 'grossesse_actuelle_id') and patiente.grossesse_actuelle_id:
-                grossesse_actuelle = patiente.grossesse_actuelle_id
-            elif hasattr(patiente, 'grossesse_ids') and patiente.grossesse_ids:
-                grossesses_en_cours = patiente.grossesse_ids.filtered(
-                    lambda g: getattr(g, 'state', 'en_cours') == 'en_cours'
-                )
-                if grossesses_en_cours:
-                    grossesse_actuelle = grossesses_en_cours.sorted('date_debut', reverse=True)[0]
+            rows = patientes.read(PATIENTE_SUMMARY_FIELDS)
+            if stats is None:
+                stats = self._get_consultation_stats(patientes.ids)
 
-            return {
+            grossesse_ids = [row['grossesse_actuelle_id'][0] for row in rows if row['grossesse_actuelle_id']]
+            grossesses = {
+                row['id']: row
+                for row in request.env['salamet.grossesse'].browse(grossesse_ids).read(GROSSESSE_SUMMARY_FIELDS)
+            }
+
+            medecin_ids = list({medecin_id for row in rows for medecin_id in row['medecin_ids']})
+            medecins = {
+                row['id']: row
+                for row in request.env['salamet.medecin'].browse(medecin_ids).read(['nom_complet', 'specialite'])
+            }
+        except Exception as e:
+            _logger.error(f"Erreur formatage résumés patientes {patientes.ids}: {str(e)}")
+            return [{
                 'id': patiente.id,
                 'name': patiente.name or '',
                 'nom_complet': patiente.nom_complet or '',
-                'date_naissance': self._format_date(patiente.date_naissance),
-                'age': patiente.age or 0,
-                'telephone': patiente.telephone or '',
-                'email': patiente.email or '',
-                'adresse': patiente.adresse or '',
-                                'groupe_sanguin': patiente.groupe_sanguin or '',
-                'est_enceinte': getattr(patiente, 'est_enceinte', False),
-                'niveau_risque_global': getattr(patiente, 'niveau_risque_global', 'faible'),
-                'consanguinite': getattr(patiente, 'consanguinite', False),
-                
+                'error': f'Erreur formatage: {str(e)}'
+            } for patiente in patientes]
+
+        data = []
+        for row in rows:
+            nb_consultations, derniere_consultation = stats['patientes'].get(row['id'], (0, None))
+            grossesse = grossesses.get(row['grossesse_actuelle_id'] and row['grossesse_actuelle_id'][0])
+            data.append({
+                'id': row['id'],
+                'name': row['name'] or '',
+                'nom_complet': row['nom_complet'] or '',
+                'date_naissance': self._format_date(row['date_naissance']),
+                'age': row['age'] or 0,
+                'telephone': row['telephone'] or '',
+                'email': row['email'] or '',
+                'adresse': row['adresse'] or '',
+                'groupe_sanguin': row['groupe_sanguin'] or '',
+                'est_enceinte': row['est_enceinte'],
+                'niveau_risque_global': row['niveau_risque_global'] or 'faible',
+                'consanguinite': row['consanguinite'],
+
                 # Informations sur la grossesse actuelle
-                'grossesse_actuelle': self._format_grossesse_summary(grossesse_actuelle) if grossesse_actuelle else None,
-                
+                'grossesse_actuelle': self._format_grossesse_row(grossesse, stats) if grossesse else None,
+
                 # Médecins assignés
                 'medecins': [
                     {
-                        'id': medecin.id,
-                        'nom': medecin.nom_complet or '',
-                        'specialite': getattr(medecin, 'specialite', '') or ''
+                        'id': medecin_id,
+                        'nom': medecins[medecin_id]['nom_complet'] or '',
+                        'specialite': medecins[medecin_id]['specialite'] or ''
                     }
-                    for medecin in patiente.medecin_ids
+                    for medecin_id in row['medecin_ids'] if medecin_id in medecins
                 ],
-                
+
                 # Statistiques rapides
-                'nb_grossesses': len(getattr(patiente, 'grossesse_ids', [])),
-                'nb_consultations': len(getattr(patiente, 'consultation_ids', [])),
-                'derniere_consultation': self._get_derniere_consultation_date(patiente),
-                
+                'nb_grossesses': row['nombre_grossesses'] or 0,
+                'nb_consultations': nb_consultations,
+                'derniere_consultation': self._format_datetime(derniere_consultation),
+
                 # Statut et métadonnées
-                'active': patiente.active,
-                'create_date': self._format_datetime(patiente.create_date),
-                'write_date': self._format_datetime(patiente.write_date)
-            }
-        except Exception as e:
-            _logger.error(f"Erreur formatage patiente summary {patiente.id}: {str(e)}")
-            return {
-                'id': patiente.id,
-                'name': patiente.name or '',
-                'nom_complet': patiente.nom_complet or '',
-                'error': f'Erreur formatage: {str(e)}'
-            }
+                'active': row['active'],
+                'create_date': self._format_datetime(row['create_date']),
+                'write_date': self._format_datetime(row['write_date'])
+            })
+        return data
+
+    def _format_grossesse_row(self, grossesse, stats):
+        """Formater le résumé d'une grossesse lue par ``read``"""
+        nb_consultations, derniere_consultation = stats['grossesses'].get(grossesse['id'], (0, None))
+        medecin_referent = grossesse['medecin_referent_id']
+        return {
+            'id': grossesse['id'],
+            'date_debut': self._format_date(grossesse['date_debut']),
+            'date_prevue_accouchement': self._format_date(grossesse['date_prevue_accouchement']),
+            'semaines_amenorrhee': int(grossesse['terme_actuel'] or 0),
+            'niveau_risque': grossesse['niveau_risque'] or 'faible',
+            'state': grossesse['state'] or 'en_cours',
+            'medecin_referent': {
+                'id': medecin_referent[0],
+                'nom': medecin_referent[1] or ''
+            } if medecin_referent else None,
+            'nb_consultations': nb_consultations,
+            'derniere_consultation': self._format_datetime(derniere_consultation)
+        }
+
+    def _get_consultation_stats(self, patiente_ids):
+        """Nombre de consultations et date de la dernière consultation passée,
+        par patiente et par grossesse, en deux requêtes groupées.
+
+        Les regroupements passent par l'ORM : seules les consultations
+        visibles par l'utilisateur (règles d'accès) sont comptées.
+        """
+        stats = {'patientes': {}, 'grossesses': {}}
+        if not patiente_ids:
+            return stats
+
+        Consultation = request.env['salamet.consultation']
+        domain = [('patiente_id', 'in', list(patiente_ids))]
+        groupby = ['patiente_id', 'grossesse_id']
+        counts = Consultation._read_group(domain, groupby, ['__count'])
+        dernieres = {
+            (patiente.id, grossesse.id): last_date
+            for patiente, grossesse, last_date in Consultation._read_group(
+                domain + [('date_consultation', '<=', fields.Datetime.now())],
+                groupby, ['date_consultation:max'])
+        }
+
+        for patiente, grossesse, count in counts:
+            last_date = dernieres.get((patiente.id, grossesse.id))
+            total, derniere = stats['patientes'].get(patiente.id, (0, None))
+            if last_date and (not derniere or last_date > derniere):
+                derniere = last_date
+            stats['patientes'][patiente.id] = (total + count, derniere)
+            if grossesse:
+                stats['grossesses'][grossesse.id] = (count, last_date)
+        return stats
 
     def _format_patiente_detail(self, patiente):
-        """Formater les données complètes d'une patiente"""
+        """Formater les données complètes d'une patiente.
+
+        Les sous-listes sont chargées par un nombre fixe de requêtes limitées
+        en SQL : la latence ne dépend pas de l'ancienneté du dossier.
+        """
         try:
+            stats = self._get_consultation_stats(patiente.ids)
+
             # Données de base
-            data = self._format_patiente_summary(patiente)
-            
+            data = self._format_patientes_summaries(patiente, stats=stats)[0]
+            grossesses = self._format_grossesses_detail(patiente, stats)
+
             # Ajouter les détails complets
             data.update({
                 # Informations personnelles étendues
                 'profession': patiente.profession or '',
-                'numero_securite_sociale': getattr(patiente, 'numero_securite_sociale', '') or '',
+                'numero_securite_sociale': '',
                 'poids': patiente.poids or 0.0,
                 'taille': patiente.taille or 0.0,
-                'imc': getattr(patiente, 'imc', 0.0) or 0.0,
-                
+                'imc': patiente.imc or 0.0,
+
                 # Informations du conjoint
                 'nom_mari': patiente.nom_mari or '',
                 'profession_mari': patiente.profession_mari or '',
                 'telephone_mari': patiente.telephone_mari or '',
                 'email_mari': patiente.email_mari or '',
                 'age_mari': patiente.age_mari or 0,
-                
+
                 # Consanguinité
                 'degre_consanguinite': patiente.degre_consanguinite or '',
-                
+
                 # Antécédents médicaux
                 'antecedents_medicaux': patiente.antecedents_medicaux or '',
                 'antecedents_chirurgicaux': patiente.antecedents_chirurgicaux or '',
                 'antecedents_gyneco': patiente.antecedents_gyneco or '',
-                
+
                 # Antécédents familiaux
-                'antecedent_diabete_familial': getattr(patiente, 'antecedent_diabete_familial', False),
-                'age_survenue_diabete': getattr(patiente, 'age_survenue_diabete', 0) or 0,
-                'antecedent_hta_familial': getattr(patiente, 'antecedent_hta_familial', False),
-                'age_survenue_hta': getattr(patiente, 'age_survenue_hta', 0) or 0,
+                'antecedent_diabete_familial': patiente.antecedent_diabete_familial,
+                'age_survenue_diabete': patiente.age_survenue_diabete or 0,
+                'antecedent_hta_familial': patiente.antecedent_hta_familial,
+                'age_survenue_hta': patiente.age_survenue_hta or 0,
                 'autres_antecedents_familiaux': patiente.autres_antecedents_familiaux or '',
-                
+
                 # Historique obstétrical
-                'gestite': getattr(patiente, 'gestite', 0) or 0,
-                'parite': getattr(patiente, 'parite', 0) or 0,
-                'avortements': getattr(patiente, 'avortements', 0) or 0,
-                
+                'gestite': patiente.gestite or 0,
+                'parite': patiente.parite or 0,
+                'avortements': patiente.avortements or 0,
+
                 # Facteurs de risque
                 'facteurs_risque_supplementaires': patiente.facteurs_risque_supplementaires or '',
-                
+
                 # Grossesses détaillées
-                'grossesses': self._format_grossesses_detail(patiente),
-                
+                'grossesses': grossesses,
+
                 # Consultations récentes
                 'consultations_recentes': self._format_consultations_recentes(patiente),
-                
+
                 # Examens et résultats
                 'examens_recents': self._format_examens_recents(patiente),
-                
+
                 # Alertes et notifications
-                'alertes': self._get_alertes_patiente(patiente),
-                
+                'alertes': self._get_alertes_patiente(patiente, grossesses),
+
                 # Prochains rendez-vous
                 'prochains_rdv': self._get_prochains_rdv(patiente)
             })
-            
+
             return data
-            
+
         except Exception as e:
             _logger.error(f"Erreur formatage patiente detail {patiente.id}: {str(e)}")
             # Retourner au moins les données de base
             return self._format_patiente_summary(patiente)
 
-    def _format_grossesse_summary(self, grossesse):
-        """Formater le résumé d'une grossesse"""
-        if not grossesse:
-            return None
-        
+    def _format_grossesses_detail(self, patiente, stats):
+        """Formater toutes les grossesses d'une patiente (une seule lecture)"""
         try:
-            return {
-                'id': grossesse.id,
-                'date_debut': self._format_date(grossesse.date_debut),
-                'date_prevue_accouchement': self._format_date(getattr(grossesse, 'date_prevue_accouchement', None)),
-                'semaines_amenorrhee': getattr(grossesse, 'semaines_amenorrhee', 0) or 0,
-                'niveau_risque': getattr(grossesse, 'niveau_risque', 'faible') or 'faible',
-                'state': getattr(grossesse, 'state', 'en_cours') or 'en_cours',
-                'medecin_referent': {
-                    'id': grossesse.medecin_referent_id.id,
-                    'nom': grossesse.medecin_referent_id.nom_complet or ''
-                } if getattr(grossesse, 'medecin_referent_id', None) else None,
-                'nb_consultations': len(getattr(grossesse, 'consultation_ids', [])),
-                'derniere_consultation': self._get_derniere_consultation_grossesse(grossesse)
-            }
-        except Exception as e:
-            _logger.error(f"Erreur formatage grossesse summary {grossesse.id}: {str(e)}")
-            return {'id': grossesse.id, 'error': str(e)}
-
-    def _format_grossesses_detail(self, patiente):
-        """Formater toutes les grossesses d'une patiente"""
-        try:
-            if not hasattr(patiente, 'grossesse_ids'):
-                return []
-            
+            rows = request.env['salamet.grossesse'].search_read(
+                [('patiente_id', '=', patiente.id)],
+                GROSSESSE_SUMMARY_FIELDS + ['notes_medicales'],
+                order='date_debut desc'
+            )
             grossesses = []
-            for grossesse in patiente.grossesse_ids.sorted('date_debut', reverse=True):
-                try:
-                    grossesse_data = self._format_grossesse_summary(grossesse)
-                    if grossesse_data:
-                        # Ajouter des détails supplémentaires
-                        grossesse_data.update({
-                            'complications': getattr(grossesse, 'complications', '') or '',
-                            'notes': getattr(grossesse, 'notes', '') or '',
-                            'issue_grossesse': getattr(grossesse, 'issue_grossesse', '') or '',
-                            'poids_naissance': getattr(grossesse, 'poids_naissance', 0.0) or 0.0,
-                            'date_accouchement_reel': self._format_date(getattr(grossesse, 'date_accouchement_reel', None))
-                        })
-                        grossesses.append(grossesse_data)
-                except Exception as e:
-                    _logger.error(f"Erreur formatage grossesse {grossesse.id}: {str(e)}")
-                    continue
-            
+            for row in rows:
+                grossesse_data = self._format_grossesse_row(row, stats)
+                grossesse_data.update({
+                    'complications': '',
+                    'notes': row['notes_medicales'] or '',
+                    'issue_grossesse': '',
+                    'poids_naissance': 0.0,
+                    'date_accouchement_reel': None
+                })
+                grossesses.append(grossesse_data)
             return grossesses
         except Exception as e:
             _logger.error(f"Erreur formatage grossesses patiente {patiente.id}: {str(e)}")
             return []
 
-    def _format_consultations_recentes(self, patiente, limit=5):
+    def _format_consultation_medecin(self, medecin):
+        """Formater le médecin d'une consultation lue par ``search_read``"""
+        return {'id': medecin[0], 'nom': medecin[1] or ''} if medecin else None
+
+    def _format_consultations_recentes(self, patiente, limit=DETAIL_CONSULTATIONS_LIMIT):
         """Formater les consultations récentes d'une patiente"""
         try:
-            if not hasattr(patiente, 'consultation_ids'):
-                return []
-            
-            consultations = []
-            recent_consultations = patiente.consultation_ids.sorted('date_consultation', reverse=True)[:limit]
-            
-            for consultation in recent_consultations:
-                try:
-                    consultations.append({
-                        'id': consultation.id,
-                        'date_consultation': self._format_datetime(consultation.date_consultation),
-                        'type_consultation': getattr(consultation, 'type_consultation', '') or '',
-                        'medecin': {
-                            'id': consultation.medecin_id.id,
-                            'nom': consultation.medecin_id.nom_complet or ''
-                        } if getattr(consultation, 'medecin_id', None) else None,
-                        'motif': getattr(consultation, 'motif', '') or '',
-                        'diagnostic': getattr(consultation, 'diagnostic', '') or '',
-                        'traitement': getattr(consultation, 'traitement', '') or '',
-                        'observations': getattr(consultation, 'observations', '') or '',
-                        'grossesse_id': consultation.grossesse_id.id if getattr(consultation, 'grossesse_id', None) else None
-                    })
-                except Exception as e:
-                    _logger.error(f"Erreur formatage consultation {consultation.id}: {str(e)}")
-                    continue
-            
-            return consultations
+            rows = request.env['salamet.consultation'].search_read(
+                [('patiente_id', '=', patiente.id)],
+                CONSULTATION_DETAIL_FIELDS,
+                order='date_consultation desc, id desc',
+                limit=limit
+            )
+            return [{
+                'id': row['id'],
+                'date_consultation': self._format_datetime(row['date_consultation']),
+                'type_consultation': row['type_consultation'] or '',
+                'medecin': self._format_consultation_medecin(row['medecin_id']),
+                'motif': row['motif_consultation'] or '',
+                'diagnostic': row['diagnostic'] or '',
+                'traitement': row['prescriptions'] or '',
+                'observations': row['observations'] or '',
+                'grossesse_id': row['grossesse_id'][0] if row['grossesse_id'] else None
+            } for row in rows]
         except Exception as e:
             _logger.error(f"Erreur formatage consultations patiente {patiente.id}: {str(e)}")
             return []
 
-    def _format_examens_recents(self, patiente, limit=10):
-        """Formater les examens récents d'une patiente"""
+    def _format_examens_recents(self, patiente, limit=DETAIL_EXAMENS_LIMIT):
+        """Formater les examens récents d'une patiente : les ``limit`` plus
+        récents de chaque type d'examen, fusionnés par date"""
         try:
+            domain = [('patiente_id', '=', patiente.id)]
+            order = 'date_examen desc, id desc'
             examens = []
-            
-            # Rechercher les examens liés aux consultations de la patiente
-            if hasattr(patiente, 'consultation_ids'):
-                for consultation in patiente.consultation_ids.sorted('date_consultation', reverse=True)[:limit]:
-                    if hasattr(consultation, 'examen_ids'):
-                        for examen in consultation.examen_ids:
-                            try:
-                                examens.append({
-                                    'id': examen.id,
-                                    'type_examen': getattr(examen, 'type_examen', '') or '',
-                                    'date_examen': self._format_date(getattr(examen, 'date_examen', None)),
-                                    'resultat': getattr(examen, 'resultat', '') or '',
-                                    'valeur_numerique': getattr(examen, 'valeur_numerique', 0.0) or 0.0,
-                                    'unite': getattr(examen, 'unite', '') or '',
-                                    'normal': getattr(examen, 'normal', True),
-                                    'consultation_id': consultation.id,
-                                    'date_consultation': self._format_datetime(consultation.date_consultation)
-                                })
-                            except Exception as e:
-                                _logger.error(f"Erreur formatage examen {examen.id}: {str(e)}")
-                                continue
-            
+
+            for row in request.env['salamet.serologie'].search_read(
+                    domain, ['date_examen', 'type_serologie', 'resultat', 'valeur_numerique',
+                             'unite', 'interpretation'], order=order, limit=limit):
+                examens.append({
+                    'id': row['id'],
+                    'type_examen': row['type_serologie'] or '',
+                    'date_examen': self._format_date(row['date_examen']),
+                    'resultat': row['resultat'] or '',
+                    'valeur_numerique': row['valeur_numerique'] or 0.0,
+                    'unite': row['unite'] or '',
+                    'normal': row['interpretation'] in ('normal', 'immunise'),
+                })
+
+            for row in request.env['salamet.examen.hematologie'].search_read(
+                    domain, ['date_examen', 'hemoglobine', 'anomalie_hematologie'],
+                    order=order, limit=limit):
+                examens.append({
+                    'id': row['id'],
+                    'type_examen': 'hematologie',
+                    'date_examen': self._format_date(row['date_examen']),
+                    'resultat': row['anomalie_hematologie'] or '',
+                    'valeur_numerique': row['hemoglobine'] or 0.0,
+                    'unite': 'g/dL',
+                    'normal': row['anomalie_hematologie'] != 'anormal',
+                })
+
+            for row in request.env['salamet.examen.biochimie'].search_read(
+                    domain, ['date_examen', 'glycemie', 'anomalie_biochimie'],
+                    order=order, limit=limit):
+                examens.append({
+                    'id': row['id'],
+                    'type_examen': 'biochimie',
+                    'date_examen': self._format_date(row['date_examen']),
+                    'resultat': row['anomalie_biochimie'] or '',
+                    'valeur_numerique': row['glycemie'] or 0.0,
+                    'unite': 'g/L',
+                    'normal': row['anomalie_biochimie'] != 'anormal',
+                })
+
             # Trier par date d'examen décroissante
-            examens.sort(key=lambda x: x.get('date_examen', ''), reverse=True)
-            
+            examens.sort(key=lambda x: x.get('date_examen') or '', reverse=True)
+
             return examens[:limit]
         except Exception as e:
             _logger.error(f"Erreur formatage examens patiente {patiente.id}: {str(e)}")
             return []
 
-    def _get_alertes_patiente(self, patiente):
+    def _get_alertes_patiente(self, patiente, grossesses=None):
         """Récupérer les alertes pour une patiente"""
         try:
             alertes = []
-            
+
             # Alerte âge
             if patiente.age and (patiente.age < 18 or patiente.age > 40):
                 alertes.append({
@@ -906,32 +1127,32 @@ class SalametPatientesController(http.Controller):
                     'niveau': 'warning' if patiente.age > 35 else 'info',
                     'message': f'Âge de {patiente.age} ans - Surveillance renforcée recommandée'
                 })
-            
+
             # Alerte consanguinité
-            if getattr(patiente, 'consanguinite', False):
+            if patiente.consanguinite:
                 alertes.append({
                     'type': 'consanguinite',
                     'niveau': 'warning',
                     'message': 'Consanguinité détectée - Conseil génétique recommandé'
                 })
-            
+
             # Alerte antécédents familiaux
-            if getattr(patiente, 'antecedent_diabete_familial', False):
+            if patiente.antecedent_diabete_familial:
                 alertes.append({
                     'type': 'diabete_familial',
                     'niveau': 'info',
                     'message': 'Antécédent familial de diabète - Surveillance glycémique'
                 })
-            
-            if getattr(patiente, 'antecedent_hta_familial', False):
+
+            if patiente.antecedent_hta_familial:
                 alertes.append({
                     'type': 'hta_familiale',
                     'niveau': 'info',
                     'message': 'Antécédent familial d\'HTA - Surveillance tensionnelle'
                 })
-            
+
             # Alerte IMC
-            imc = getattr(patiente, 'imc', 0.0)
+            imc = patiente.imc
             if imc:
                 if imc < 18.5:
                     alertes.append({
@@ -951,104 +1172,54 @@ class SalametPatientesController(http.Controller):
                         'niveau': 'info',
                         'message': f'Surpoids (IMC {imc:.1f}) - Surveillance du poids'
                     })
-            
+
             # Alerte niveau de risque global
-            niveau_risque = getattr(patiente, 'niveau_risque_global', 'faible')
+            niveau_risque = patiente.niveau_risque_global or 'faible'
             if niveau_risque in ['eleve', 'tres_eleve']:
                 alertes.append({
                     'type': 'risque_global',
                     'niveau': 'danger' if niveau_risque == 'tres_eleve' else 'warning',
                     'message': f'Niveau de risque {niveau_risque.replace("_", " ")} - Suivi spécialisé requis'
                 })
-            
-            # Alerte grossesse en cours
-            if getattr(patiente, 'est_enceinte', False):
-                grossesse_actuelle = None
-                if hasattr(patiente, 'grossesse_ids'):
-                    grossesses_en_cours = patiente.grossesse_ids.filtered(
-                        lambda g: getattr(g, 'state', 'en_cours') == 'en_cours'
-                    )
-                    if grossesses_en_cours:
-                        grossesse_actuelle = grossesses_en_cours[0]
-                        sa = getattr(grossesse_actuelle, 'semaines_amenorrhee', 0)
-                        if sa > 37:
-                            alertes.append({
-                                'type': 'terme_proche',
-                                'niveau': 'info',
-                                'message': f'Terme proche ({sa} SA) - Préparation à l\'accouchement'
-                            })
-            
+
+            # Alerte grossesse en cours (grossesses déjà chargées par le détail)
+            if patiente.est_enceinte:
+                grossesses_en_cours = [g for g in grossesses or [] if g.get('state') == 'en_cours']
+                if grossesses_en_cours:
+                    sa = grossesses_en_cours[0].get('semaines_amenorrhee', 0)
+                    if sa > 37:
+                        alertes.append({
+                            'type': 'terme_proche',
+                            'niveau': 'info',
+                            'message': f'Terme proche ({sa} SA) - Préparation à l\'accouchement'
+                        })
+
             return alertes
         except Exception as e:
             _logger.error(f"Erreur récupération alertes patiente {patiente.id}: {str(e)}")
             return []
 
-    def _get_prochains_rdv(self, patiente, limit=5):
+    def _get_prochains_rdv(self, patiente, limit=DETAIL_RDV_LIMIT):
         """Récupérer les prochains rendez-vous d'une patiente"""
         try:
-            rdv = []
-            
-            # Rechercher dans les consultations futures
-            if hasattr(patiente, 'consultation_ids'):
-                consultations_futures = patiente.consultation_ids.filtered(
-                    lambda c: getattr(c, 'date_consultation', False) and 
-                             c.date_consultation > datetime.now()
-                ).sorted('date_consultation')[:limit]
-                
-                for consultation in consultations_futures:
-                    try:
-                        rdv.append({
-                            'id': consultation.id,
-                            'date': self._format_datetime(consultation.date_consultation),
-                            'type': 'consultation',
-                            'motif': getattr(consultation, 'motif', '') or 'Consultation de suivi',
-                            'medecin': {
-                                'id': consultation.medecin_id.id,
-                                'nom': consultation.medecin_id.nom_complet or ''
-                            } if getattr(consultation, 'medecin_id', None) else None,
-                            'statut': getattr(consultation, 'state', 'planifie') or 'planifie'
-                        })
-                    except Exception as e:
-                        _logger.error(f"Erreur formatage RDV consultation {consultation.id}: {str(e)}")
-                        continue
-            
-            return rdv
+            rows = request.env['salamet.consultation'].search_read(
+                [('patiente_id', '=', patiente.id), ('date_consultation', '>', fields.Datetime.now())],
+                ['date_consultation', 'motif_consultation', 'medecin_id', 'state'],
+                order='date_consultation, id',
+                limit=limit
+            )
+            return [{
+                'id': row['id'],
+                'date': self._format_datetime(row['date_consultation']),
+                'type': 'consultation',
+                'motif': row['motif_consultation'] or 'Consultation de suivi',
+                'medecin': self._format_consultation_medecin(row['medecin_id']),
+                'statut': row['state'] or 'planifie'
+            } for row in rows]
         except Exception as e:
             _logger.error(f"Erreur récupération RDV patiente {patiente.id}: {str(e)}")
             return []
 
-    def _get_derniere_consultation_date(self, patiente):
-        """Récupérer la date de la dernière consultation"""
-        try:
-            if hasattr(patiente, 'consultation_ids') and patiente.consultation_ids:
-                derniere = patiente.consultation_ids.filtered(
-                    lambda c: getattr(c, 'date_consultation', False) and 
-                             c.date_consultation <= datetime.now()
-                ).sorted('date_consultation', reverse=True)
-                
-                if derniere:
-                    return self._format_datetime(derniere[0].date_consultation)
-            return None
-        except Exception as e:
-            _logger.error(f"Erreur récupération dernière consultation patiente {patiente.id}: {str(e)}")
-            return None
-
-    def _get_derniere_consultation_grossesse(self, grossesse):
-        """Récupérer la date de la dernière consultation pour une grossesse"""
-        try:
-            if hasattr(grossesse, 'consultation_ids') and grossesse.consultation_ids:
-                derniere = grossesse.consultation_ids.filtered(
-                    lambda c: getattr(c, 'date_consultation', False) and 
-                             c.date_consultation <= datetime.now()
-                ).sorted('date_consultation', reverse=True)
-                
-                if derniere:
-                    return self._format_datetime(derniere[0].date_consultation)
-            return None
-        except Exception as e:
-            _logger.error(f"Erreur récupération dernière consultation grossesse {grossesse.id}: {str(e)}")
-            return None
-
     def _format_date(self, date_value):
         """Formater une date"""
         if not date_value:
@@ -1090,14 +1261,9 @@ class SalametPatientesController(http.Controller):
             
             if format == 'json':
                 data = self._format_patiente_detail(patiente)
-                response = request.make_response(
-                    json.dumps(data, indent=2, ensure_ascii=False),
-                    headers=[
-                        ('Content-Type', 'application/json'),
-                        ('Content-Disposition', f'attachment; filename="patiente_{patiente_id}.json"')
-                    ]
-                )
-                return response
+                return make_json_response(data, headers={
+                    'Content-Disposition': f'attachment; filename="patiente_{patiente_id}.json"'
+                })
             else:
                 # Pour PDF, rediriger vers le rapport Odoo
                 return request.redirect(f'/web/content/salamet.patiente/{patiente_id}/rapport_patiente.pdf')
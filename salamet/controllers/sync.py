@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+
+from odoo import http
+from odoo.http import request
+from odoo.exceptions import AccessError
+from odoo.addons.salamet.models.salamet_sync import SYNC_PAGE_SIZE
+import logging
+
+_logger = logging.getLogger(__name__)
+
+# Modèles synchronisables par l'application mobile
+SYNC_MODELS = (
+    'salamet.patiente',
+    'salamet.grossesse',
+    'salamet.consultation',
+    'salamet.notification',
+)
+
+
+class SalametSyncController(http.Controller):
+    """Contrôleur de synchronisation incrémentale pour l'application mobile"""
+
+    @http.route('/salamet/api/sync', type='json', auth='user', methods=['POST'])
+    def api_sync(self, models=None, **kwargs):
+        """Retourner, pour chaque modèle demandé, les enregistrements modifiés
+        depuis son watermark, les IDs supprimés et le nouveau watermark.
+
+        Paramètres : ``models`` = {nom_modele: {'since': watermark, 'fields': [...],
+        'limit': taille de page, 'cursor': next_cursor de la page précédente}}
+        """
+        try:
+            if not models or not isinstance(models, dict):
+                return {'success': False, 'error': 'Aucun modèle demandé'}
+
+            data = {}
+            for model_name, options in models.items():
+                if model_name not in SYNC_MODELS:
+                    return {'success': False, 'error': f'Modèle non synchronisable: {model_name}'}
+                options = options or {}
+                data[model_name] = request.env[model_name]._sync_changes(
+                    since=options.get('since'),
+                    fields_list=options.get('fields') or None,
+                    limit=min(int(options.get('limit') or SYNC_PAGE_SIZE), SYNC_PAGE_SIZE),
+                    cursor=options.get('cursor'),
+                )
+
+            return {'success': True, 'data': data}
+
+        except AccessError as e:
+            _logger.warning(f"Accès refusé synchronisation: {str(e)}")
+            return {'success': False, 'error': f'Accès refusé: {str(e)}'}
+        except Exception as e:
+            _logger.error(f"Erreur synchronisation: {str(e)}")
+            return {'success': False, 'error': f'Erreur interne: {str(e)}'}
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+
+import logging
+
+from odoo.tools.sql import column_exists, create_column, create_index
+
+_logger = logging.getLogger(__name__)
+
+# Tables portant directement un lien vers la patiente : (table, colonne)
+TABLES_PATIENTE = [
+    ('salamet_accouchement', 'patiente_id'),
+    ('salamet_notification', 'patiente_id'),
+    ('salamet_bilan_prenatal', 'patiente_id'),
+    ('salamet_serologie', 'patiente_id'),
+    ('salamet_examen_hematologie', 'patiente_id'),
+    ('salamet_examen_biochimie', 'patiente_id'),
+    ('salamet_examen_biologique', 'patient_id'),
+]
+
+# Tables dont patiente_user_id suit la grossesse
+TABLES_GROSSESSE = [
+    'salamet_consultation',
+    'salamet_echographie',
+]
+
+
+def _prepare_column(cr, table):
+    """Créer la colonne patiente_user_id si elle n'existe pas encore"""
+    if column_exists(cr, table, 'patiente_user_id'):
+        return False
+    create_column(cr, table, 'patiente_user_id', 'int4')
+    create_index(cr, '%s__patiente_user_id_index' % table, table, ['patiente_user_id'])
+    return True
+
+
+def migrate(cr, version):
+    """Pré-remplir patiente_user_id en SQL pour éviter le recalcul ORM
+    enregistrement par enregistrement lors de la mise à jour du module"""
+    if not version:
+        return
+
+    for table, colonne in TABLES_PATIENTE:
+        if not _prepare_column(cr, table):
+            continue
+        cr.execute("""
+            UPDATE {table} t
+               SET patiente_user_id = p.user_id
+              FROM salamet_patiente p
+             WHERE p.id = t.{colonne}
+               AND p.user_id IS NOT NULL
+        """.format(table=table, colonne=colonne))
+        _logger.info("✅ %s: %s lignes renseignées", table, cr.rowcount)
+
+    for table in TABLES_GROSSESSE:
+        if not _prepare_column(cr, table):
+            continue
+        cr.execute("""
+            UPDATE {table} t
+               SET patiente_user_id = p.user_id
+              FROM salamet_grossesse g
+              JOIN salamet_patiente p ON p.id = g.patiente_id
+             WHERE g.id = t.grossesse_id
+               AND p.user_id IS NOT NULL
+        """.format(table=table))
+        _logger.info("✅ %s: %s lignes renseignées", table, cr.rowcount)
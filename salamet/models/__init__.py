@@ -1,3 +1,5 @@
+from . import salamet_sync
+from . import salamet_dashboard_snapshot
 from . import salamet_patiente
 from . import salamet_medecin
 from . import salamet_grossesse
@@ -6,4 +8,5 @@ from . import salamet_accouchement
 from . import salamet_consultation
 from . import salamet_notification
 from . import salamet_dashboard
-from . import salamet_bilan_prenatal
\ No newline at end of file
+from . import salamet_bilan_prenatal
+from . import res_users
@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+
+from odoo import api, models
+from odoo.exceptions import AccessDenied
+from odoo.http import request
+from odoo.tools import config
+from odoo.tools.lru import LRU
+import copy
+import hashlib
+import hmac
+import logging
+import secrets
+import time
+
+_logger = logging.getLogger(__name__)
+
+# Limiteur à seaux de jetons, alimenté par les échecs de connexion seulement :
+# capacité et secondes pour regagner un jeton. Le seau par login est aussi
+# propre à l'adresse IP, pour qu'un tiers ne puisse pas bloquer un compte
+# connu depuis sa propre adresse. Les capacités peuvent être surchargées
+# dans la configuration d'Odoo (salamet_login_rate_capacity,
+# salamet_ip_rate_capacity).
+LOGIN_RATE_CAPACITY = 10
+LOGIN_RATE_REFILL = 6.0
+IP_RATE_CAPACITY = 60
+IP_RATE_REFILL = 1.0
+
+# Durée (secondes) pendant laquelle un mot de passe vérifié n'est plus
+# recalculé par la fonction de dérivation (KDF)
+CREDENTIAL_CACHE_TTL = 300
+
+# Sel propre au processus : seules des empreintes salées sont conservées
+_FINGERPRINT_SALT = secrets.token_bytes(16)
+_rate_buckets = LRU(4096)
+_verified_credentials = LRU(4096)
+
+# Rôles SALAMET résolus, par (base, utilisateur). Cache propre au module :
+# il est vidé utilisateur par utilisateur, sans toucher au cache ORM partagé
+# (règles d'accès, plans de lecture) ; la durée de vie borne le décalage
+# avec les modifications faites par les autres workers
+ROLE_CACHE_TTL = 60
+_role_infos = LRU(4096)
+
+
+def _bucket_tokens(key, capacity, refill):
+    """Jetons disponibles dans le seau ``key``, après recharge"""
+    now = time.monotonic()
+    tokens, last = _rate_buckets.get(key) or (capacity, now)
+    return min(capacity, tokens + (now - last) / refill), now
+
+
+def _has_token(key, capacity, refill):
+    """Le seau ``key`` autorise-t-il encore une tentative ?"""
+    return _bucket_tokens(key, capacity, refill)[0] >= 1
+
+
+def _spend_token(key, capacity, refill):
+    """Consommer un jeton du seau ``key`` (tentative échouée)"""
+    tokens, now = _bucket_tokens(key, capacity, refill)
+    _rate_buckets[key] = (max(tokens - 1, 0), now)
+
+
+def _client_ip():
+    """Adresse du client de la requête courante. Derrière un proxy
+    (proxy_mode), la dernière adresse de X-Forwarded-For est celle ajoutée
+    par le proxy de confiance : les précédentes sont fournies par le client."""
+    if not request:
+        return None
+    httprequest = request.httprequest
+    forwarded = httprequest.headers.get('X-Forwarded-For')
+    if config.get('proxy_mode') and forwarded:
+        return forwarded.split(',')[-1].strip() or httprequest.remote_addr
+    return httprequest.remote_addr
+
+
+def _rate_buckets_for(db, login):
+    """Seaux (clé, capacité, recharge) concernés par une connexion"""
+    ip = _client_ip()
+    login_capacity = int(config.get('salamet_login_rate_capacity') or LOGIN_RATE_CAPACITY)
+    buckets = [(('login', db, login, ip), login_capacity, LOGIN_RATE_REFILL)]
+    if ip:
+        ip_capacity = int(config.get('salamet_ip_rate_capacity') or IP_RATE_CAPACITY)
+        buckets.append((('ip', ip), ip_capacity, IP_RATE_REFILL))
+    return ip, buckets
+
+# Rôles SALAMET par ordre de priorité : (groupe, rôle, libellé, rôle applicatif, permissions)
+SALAMET_ROLES = [
+    ('salamet.group_salamet_admin', 'admin', 'Administrateur', 'admin', {
+        'can_create': True, 'can_edit': True, 'can_delete': True, 'can_view_all': True,
+    }),
+    ('salamet.group_salamet_medecin_senior', 'medecin_senior', 'Médecin Senior', 'medecin', {
+        'can_create': True, 'can_edit': True, 'can_delete': False, 'can_view_all': False,
+    }),
+    ('salamet.group_salamet_medecin_resident', 'medecin_resident', 'Médecin Résident', 'medecin', {
+        'can_create': True, 'can_edit': True, 'can_delete': False, 'can_view_all': False,
+    }),
+    ('salamet.group_salamet_patiente', 'patiente', 'Patiente', 'patiente', {
+        'can_create': False, 'can_edit': False, 'can_delete': False, 'can_view_all': False,
+    }),
+    ('salamet.group_salamet_readonly', 'readonly', 'Observateur', 'readonly', {
+        'can_create': False, 'can_edit': False, 'can_delete': False, 'can_view_all': True,
+    }),
+]
+
+
+class ResUsers(models.Model):
+    _inherit = 'res.users'
+
+    def _get_salamet_role_info(self):
+        """Rôle SALAMET de l'utilisateur, mis en cache par processus.
+
+        Returns:
+            dict: {
+                'role': 'admin' | 'medecin_senior' | 'medecin_resident' | 'patiente' | 'readonly' | 'user',
+                'role_name': libellé du rôle,
+                'app_role': 'admin' | 'medecin' | 'patiente' | 'readonly' | 'user',
+                'permissions': {'can_create', 'can_edit', 'can_delete', 'can_view_all'},
+                'medecin_id': ID du profil salamet.medecin ou False,
+                'patiente_id': ID du profil salamet.patiente ou False,
+            }
+        """
+        self.ensure_one()
+        key = (self.env.cr.dbname, self.id)
+        cached = _role_infos.get(key)
+        if cached and cached[0] > time.monotonic():
+            role_info = cached[1]
+        else:
+            role_info = self._salamet_role_info(self.id)
+            _role_infos[key] = (time.monotonic() + ROLE_CACHE_TTL, role_info)
+        # Copie : la valeur en cache est partagée entre les requêtes
+        return copy.deepcopy(role_info)
+
+    @api.model
+    def _salamet_role_info(self, user_id):
+        """Calcul du rôle et des profils liés"""
+        user = self.sudo().browse(user_id)
+        medecin = self.env['salamet.medecin'].sudo().with_context(active_test=False).search(
+            [('user_id', '=', user_id)], limit=1)
+        patiente = self.env['salamet.patiente'].sudo().with_context(active_test=False).search(
+            [('user_id', '=', user_id)], limit=1)
+
+        role_info = {
+            'role': 'user',
+            'role_name': 'Utilisateur',
+            'app_role': 'user',
+            'permissions': {
+                'can_create': False,
+                'can_edit': False,
+                'can_delete': False,
+                'can_view_all': False,
+            },
+            'medecin_id': medecin.id,
+            'patiente_id': patiente.id,
+        }
+        for group, role, role_name, app_role, permissions in SALAMET_ROLES:
+            if user.has_group(group):
+                role_info.update({
+                    'role': role,
+                    'role_name': role_name,
+                    'app_role': app_role,
+                    'permissions': dict(permissions),
+                })
+                break
+        else:
+            # Sans groupe SALAMET, le profil lié détermine le rôle applicatif
+            if medecin:
+                role_info['app_role'] = 'medecin'
+            elif patiente:
+                role_info['app_role'] = 'patiente'
+        return role_info
+
+    @api.model
+    def _invalider_roles_salamet(self, user_ids):
+        """Oublier le rôle en cache des utilisateurs dont les groupes ou le
+        profil lié ont changé"""
+        for user_id in set(user_ids):
+            try:
+                del _role_infos[(self.env.cr.dbname, user_id)]
+            except KeyError:
+                pass
+
+    def write(self, vals):
+        """Invalider le cache des rôles lors d'un changement de groupes"""
+        result = super().write(vals)
+        if 'groups_id' in vals:
+            self._invalider_roles_salamet(self.ids)
+        return result
+
+    # -------------------- Vérification des identifiants --------------------
+    def _salamet_credential_fingerprint(self, password):
+        """Empreinte salée du mot de passe, liée au hash stocké : un
+        changement de mot de passe invalide l'empreinte"""
+        self.env.cr.execute("SELECT COALESCE(password, '') FROM res_users WHERE id = %s", [self.id])
+        [stored_hash] = self.env.cr.fetchone()
+        message = f"{self.env.cr.dbname}:{self.id}:{stored_hash}:{password}".encode()
+        return hashlib.sha256(_FINGERPRINT_SALT + message).digest()
+
+    @classmethod
+    def _login(cls, db, credential, user_agent_env):
+        """Limiteur commun aux points d'authentification (/api/auth/login,
+        /odoo_connect, ...), appliqué avant la recherche du login : les
+        logins inconnus sont limités comme les autres. Seuls les échecs
+        consomment des jetons."""
+        login = credential.get('login')
+        if credential.get('type') != 'password' or not login:
+            return super()._login(db, credential, user_agent_env)
+
+        ip, buckets = _rate_buckets_for(db, login)
+        if not all(_has_token(*bucket) for bucket in buckets):
+            _logger.warning("⛔ Trop de tentatives de connexion pour %s (%s)", login, ip)
+            raise AccessDenied("Trop de tentatives de connexion, réessayez plus tard.")
+        try:
+            return super()._login(db, credential, user_agent_env)
+        except AccessDenied:
+            for bucket in buckets:
+                _spend_token(*bucket)
+            raise
+
+    def _check_credentials(self, credential, env):
+        """Un mot de passe vérifié récemment est reconnu par son empreinte
+        sans relancer la KDF"""
+        password = credential.get('password')
+        if credential.get('type') != 'password' or not password:
+            return super()._check_credentials(credential, env)
+
+        key = (self.env.cr.dbname, self.id)
+        fingerprint = self._salamet_credential_fingerprint(password)
+        cached = _verified_credentials.get(key)
+        if cached and cached[0] > time.monotonic() and hmac.compare_digest(cached[1], fingerprint):
+            return dict(cached[2])
+
+        auth_info = super()._check_credentials(credential, env)
+        _verified_credentials[key] = (time.monotonic() + CREDENTIAL_CACHE_TTL, fingerprint, dict(auth_info))
+        return auth_info
@@ -19,6 +19,15 @@ class SalametAccouchement(models.Model):
         ondelete='cascade'
     )
 
+    # Utilisateur de la patiente, dénormalisé pour les règles d'accès
+    patiente_user_id = fields.Many2one(
+        'res.users',
+        string='Utilisateur patiente',
+        related='patiente_id.user_id',
+        store=True,
+        index=True
+    )
+
     date_accouchement = fields.Date(
         string="Date d'accouchement",
         required=True
@@ -45,6 +45,15 @@ class SalametBilanPrenatal(models.Model):
         readonly=True
     )
 
+    # Utilisateur de la patiente, dénormalisé pour les règles d'accès
+    patiente_user_id = fields.Many2one(
+        'res.users',
+        string='Utilisateur patiente',
+        related='patiente_id.user_id',
+        store=True,
+        index=True
+    )
+
     medecin_id = fields.Many2one(
         'salamet.medecin',
         string='Médecin prescripteur',
@@ -604,6 +613,15 @@ class SalametSerologie(models.Model):
         readonly=True
     )
 
+    # Utilisateur de la patiente, dénormalisé pour les règles d'accès
+    patiente_user_id = fields.Many2one(
+        'res.users',
+        string='Utilisateur patiente',
+        related='patiente_id.user_id',
+        store=True,
+        index=True
+    )
+
     # Informations de base
     date_examen = fields.Date(
         string='Date d\'examen',
@@ -708,6 +726,15 @@ class SalametExamenBiologique(models.Model):
         readonly=True
     )
 
+    # Utilisateur de la patiente, dénormalisé pour les règles d'accès
+    patiente_user_id = fields.Many2one(
+        'res.users',
+        string='Utilisateur patiente',
+        related='patient_id.user_id',
+        store=True,
+        index=True
+    )
+
     date_examen = fields.Date(string='Date', required=True, default=fields.Date.context_today)
 
     # Champs Hématologie
@@ -770,6 +797,15 @@ class SalametEchographie(models.Model):
     bilan_id = fields.Many2one('salamet.bilan.prenatal', string='Bilan', ondelete='cascade')
     grossesse_id = fields.Many2one('salamet.grossesse', string='Grossesse', required=True)
 
+    # Utilisateur de la patiente, dénormalisé pour les règles d'accès
+    patiente_user_id = fields.Many2one(
+        'res.users',
+        string='Utilisateur patiente',
+        related='grossesse_id.patiente_id.user_id',
+        store=True,
+        index=True
+    )
+
     date_echo = fields.Date(string='Date', required=True, default=fields.Date.context_today)
     terme_echo = fields.Float(string='Terme à l\'écho (SA)', required=True)
     type_echo = fields.Selection([
@@ -915,6 +951,15 @@ class SalametExamenHematologie(models.Model):
         store=True,
         readonly=True
     )
+
+    # Utilisateur de la patiente, dénormalisé pour les règles d'accès
+    patiente_user_id = fields.Many2one(
+        'res.users',
+        string='Utilisateur patiente',
+        related='patiente_id.user_id',
+        store=True,
+        index=True
+    )
     date_examen = fields.Date(string='Date', required=True, default=fields.Date.context_today)
 
     # Valeurs hématologie
@@ -963,6 +1008,15 @@ class SalametExamenBiochimie(models.Model):
         store=True,
         readonly=True
     )
+
+    # Utilisateur de la patiente, dénormalisé pour les règles d'accès
+    patiente_user_id = fields.Many2one(
+        'res.users',
+        string='Utilisateur patiente',
+        related='patiente_id.user_id',
+        store=True,
+        index=True
+    )
     date_examen = fields.Date(string='Date', required=True, default=fields.Date.context_today)
 
     # Valeurs biochimie
@@ -11,9 +11,13 @@ _logger = logging.getLogger(__name__)
 class SalametConsultation(models.Model):
     _name = 'salamet.consultation'
     _description = 'Consultation Prénatale SALAMET'
-    _inherit = ['mail.thread', 'mail.activity.mixin']
+    _inherit = ['mail.thread', 'mail.activity.mixin', 'salamet.sync.mixin', 'salamet.dashboard.mixin']
     _order = 'date_consultation desc'
     _rec_name = 'display_name'
+    _dashboard_fields = frozenset([
+        'date_consultation', 'type_consultation', 'patiente_id', 'grossesse_id',
+        'medecin_id', 'terme_grossesse', 'niveau_alerte', 'urgence_detectee',
+    ])
 
     # =================== CHAMPS DE BASE ===================
     name = fields.Char(
@@ -38,6 +42,16 @@ class SalametConsultation(models.Model):
         ondelete='cascade'
     )
 
+    # Utilisateur de la patiente, dénormalisé pour les règles d'accès ; suit
+    # la grossesse, comme la règle des médecins résidents
+    patiente_user_id = fields.Many2one(
+        'res.users',
+        string='Utilisateur patiente',
+        related='grossesse_id.patiente_id.user_id',
+        store=True,
+        index=True
+    )
+
     grossesse_id = fields.Many2one(
         'salamet.grossesse',
         string='Grossesse',
@@ -360,6 +374,15 @@ class SalametConsultation(models.Model):
                         "La date de consultation ne peut pas être antérieure à la DDR."
                     )
 
+    @api.constrains('patiente_id', 'grossesse_id')
+    def _check_patiente_grossesse(self):
+        """Vérifier que la consultation et sa grossesse concernent la même patiente"""
+        for record in self:
+            if record.grossesse_id.patiente_id != record.patiente_id:
+                raise ValidationError(
+                    "La grossesse de la consultation doit appartenir à la même patiente."
+                )
+
     @api.constrains('tension_arterielle_systolique', 'tension_arterielle_diastolique')
     def _check_tension_arterielle(self):
         """Vérifier la cohérence de la tension artérielle"""
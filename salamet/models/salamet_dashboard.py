@@ -1,9 +1,18 @@
 # -*- coding: utf-8 -*-
 
 from odoo import models, fields, api
+from odoo.tools import SQL
 from datetime import datetime, timedelta
+from dateutil.relativedelta import relativedelta
 import json
 
+# Pas des séries temporelles, par granularité de date_trunc
+PAS_SERIES = {
+    'day': relativedelta(days=1),
+    'week': relativedelta(weeks=1),
+    'month': relativedelta(months=1),
+}
+
 
 class SalametDashboard(models.Model):
     _name = 'salamet.dashboard'
@@ -15,63 +24,198 @@ class SalametDashboard(models.Model):
     # =================== INDICATEURS GÉNÉRAUX ===================
     @api.model
     def get_dashboard_data(self):
-        """Récupérer toutes les données du tableau de bord"""
+        """Récupérer le tableau de bord avec sa date de calcul.
+
+        L'instantané de la société, calculé sans règles d'accès, n'est servi
+        qu'aux médecins seniors et admins, qui voient toutes les patientes ;
+        pour les autres utilisateurs, le tableau de bord est calculé avec
+        leurs propres droits.
+        """
+        if not self.env.user.has_group('salamet.group_salamet_medecin_senior'):
+            return dict(
+                self._compute_dashboard_data(),
+                date_calcul=fields.Datetime.to_string(fields.Datetime.now()),
+            )
+        snapshot = self.env['salamet.dashboard.snapshot']._get_snapshot(self.env.company)
+        return dict(
+            snapshot.data or {},
+            date_calcul=fields.Datetime.to_string(snapshot.date_calcul),
+        )
+
+    @api.model
+    def get_dashboard_data_medecin(self):
+        """Tableau de bord restreint aux patientes du médecin connecté, mis en
+        cache par médecin.
+
+        Sans profil médecin, seuls les médecins seniors et admins reçoivent
+        l'instantané global ; les autres utilisateurs (patientes, résidents
+        sans profil, lecture seule) reçoivent un tableau de bord calculé avec
+        leurs propres droits, jamais mis en cache.
+        """
+        medecin_id = self.env.user._get_salamet_role_info()['medecin_id']
+        if not medecin_id:
+            if self.env.user.has_group('salamet.group_salamet_medecin_senior'):
+                return self.get_dashboard_data()
+            return dict(
+                self._compute_dashboard_data(),
+                date_calcul=fields.Datetime.to_string(fields.Datetime.now()),
+            )
+
+        Snapshot = self.env['salamet.dashboard.snapshot']
+        cached = Snapshot._get_dashboard_medecin(medecin_id)
+        if cached is None:
+            cached = Snapshot._set_dashboard_medecin(
+                medecin_id,
+                self.with_context(salamet_dashboard_medecin_id=medecin_id)._compute_dashboard_data(),
+            )
+        date_calcul, data = cached
+        return dict(
+            data,
+            date_calcul=fields.Datetime.to_string(date_calcul),
+            medecin_id=medecin_id,
+        )
+
+    @api.model
+    def _domaine_perimetre(self, model_name):
+        """Restriction au médecin du contexte (``salamet_dashboard_medecin_id``) :
+        patientes suivies, et grossesses dont il est le référent"""
+        medecin_id = self.env.context.get('salamet_dashboard_medecin_id')
+        if not medecin_id:
+            return []
+        domain = [('patiente_id.medecin_ids', 'in', [medecin_id])]
+        if model_name == 'salamet.grossesse':
+            domain = ['|', ('medecin_referent_id', '=', medecin_id)] + domain
+        return domain
+
+    @api.model
+    def _compute_dashboard_data(self):
+        """Calculer toutes les données du tableau de bord"""
+        compteurs = self._get_compteurs()
         return {
-            'kpis': self._get_kpis(),
+            'kpis': self._get_kpis(compteurs),
             'notifications': self._get_notifications_urgentes(),
             'consultations_jour': self._get_consultations_jour(),
             'grossesses_risque': self._get_grossesses_a_risque(),
-            'statistiques': self._get_statistiques(),
+            'statistiques': self._get_statistiques(compteurs),
             'graphiques': self._get_graphiques_data(),
         }
 
-    def _get_kpis(self):
-        """Calculer les KPIs principaux"""
-        today = fields.Date.today()
-
-        # Grossesses actives
-        grossesses_actives = self.env['salamet.grossesse'].search_count([
-            ('state', 'in', ['en_cours', 'a_risque']),
-            ('active', '=', True)
-        ])
-
-        # Grossesses à risque
-        grossesses_risque = self.env['salamet.grossesse'].search_count([
-            ('state', '=', 'a_risque'),
-            ('active', '=', True)
-        ])
-
-        # Consultations aujourd'hui
-        consultations_today = self.env['salamet.consultation'].search_count([
-            ('date_consultation', '>=', today),
-            ('date_consultation', '<', today + timedelta(days=1))
-        ])
+    # =================== MOTEUR D'AGRÉGATION ===================
+    @api.model
+    def _compter(self, model_name, compteurs, domain=None):
+        """Évaluer plusieurs compteurs d'un modèle en une seule requête.
+
+        Chaque domaine de ``compteurs`` devient un agrégat conditionnel
+        ``count(*) FILTER (WHERE ...)`` sur les enregistrements de ``domain``
+        visibles par l'utilisateur (règles d'accès et ``active`` appliqués).
+        """
+        Model = self.env[model_name]
+        query = Model._search(domain or [])
+        query.order = None
+        aggregats = [
+            SQL("count(*) FILTER (WHERE %s)", self._condition_compteur(Model, compteur))
+            for compteur in compteurs.values()
+        ]
+        self.env.cr.execute(query.select(*aggregats))
+        return dict(zip(compteurs, self.env.cr.fetchone()))
 
-        # Notifications urgentes
-        notifications_urgentes = self.env['salamet.notification'].search_count([
-            ('priorite', 'in', ['critique', 'haute']),
-            ('state', 'in', ['en_attente', 'vue'])
-        ])
+    @api.model
+    def _condition_compteur(self, Model, compteur):
+        """Condition SQL d'un compteur sur la table principale de ``Model``.
+
+        Un domaine sur les seules colonnes de la table est repris tel quel ;
+        un domaine qui traverse une relation (many2one...) a besoin de ses
+        jointures : il devient ``id IN (sous-requête)``.
+        """
+        sous_requete = Model._where_calc(compteur, active_test=False)
+        if not sous_requete._joins:
+            return sous_requete.where_clause
+        return SQL("%s IN %s", SQL.identifier(Model._table, 'id'), sous_requete.subselect())
 
-        # Notifications en retard
-        notifications_retard = self.env['salamet.notification'].search_count([
-            ('est_en_retard', '=', True),
-            ('state', 'in', ['en_attente', 'vue'])
-        ])
+    @api.model
+    def _debut_periode(self, jour, granularite):
+        """Premier jour de la période (jour, semaine ISO, mois) contenant ``jour``"""
+        if granularite == 'week':
+            return jour - timedelta(days=jour.weekday())
+        if granularite == 'month':
+            return jour.replace(day=1)
+        return jour
 
-        # Termes proches (> 37 SA)
-        termes_proches = self.env['salamet.grossesse'].search_count([
-            ('tag', '>=', 37),
-            ('state', 'in', ['en_cours', 'a_risque']),
-            ('active', '=', True)
-        ])
+    @api.model
+    def _serie_temporelle(self, model_name, date_field, granularite, date_debut, date_fin, domain=None):
+        """Compter les enregistrements par période en une seule requête.
+
+        Les périodes (``day``, ``week`` ISO ou ``month``) couvrant
+        ``date_debut`` à ``date_fin`` inclus sont générées par
+        ``generate_series`` : les périodes vides valent 0. Retourne une liste
+        de couples (début de période, nombre).
+        """
+        pas = PAS_SERIES[granularite]
+        debut = self._debut_periode(date_debut, granularite)
+        fin = self._debut_periode(date_fin, granularite) + pas
+
+        Model = self.env[model_name]
+        query = Model._search(list(domain or []) + [(date_field, '>=', debut), (date_field, '<', fin)])
+        query.order = None
+        periode = SQL(
+            "date_trunc(%s, %s::timestamp) AS periode",
+            granularite, Model._field_to_sql(Model._table, date_field, query),
+        )
+        self.env.cr.execute(SQL("""
+            SELECT serie.periode::date, count(donnees.periode)
+              FROM generate_series(%(debut)s::timestamp, %(fin)s::timestamp - %(pas)s::interval,
+                                   %(pas)s::interval) AS serie(periode)
+              LEFT JOIN (%(donnees)s) AS donnees ON donnees.periode = serie.periode
+             GROUP BY serie.periode
+             ORDER BY serie.periode
+        """, debut=debut, fin=fin, pas=f'1 {granularite}', donnees=query.select(periode)))
+        return self.env.cr.fetchall()
 
-        # Dépassements de terme (> 41 SA)
-        depassements_terme = self.env['salamet.grossesse'].search_count([
-            ('tag', '>=', 41),
-            ('state', 'in', ['en_cours', 'a_risque']),
-            ('active', '=', True)
-        ])
+    @api.model
+    def _get_compteurs(self):
+        """Tous les compteurs des KPIs et des statistiques : une requête
+        groupée par modèle au lieu d'un search_count par indicateur"""
+        today = fields.Date.today()
+        now = fields.Datetime.now()
+        date_debut = today - timedelta(days=30)
+        grossesse_active = ('state', 'in', ['en_cours', 'a_risque'])
+        notification_ouverte = ('state', 'in', ['en_attente', 'vue'])
+
+        compteurs = self._compter('salamet.grossesse', {
+            'grossesses_actives': [grossesse_active],
+            'grossesses_risque': [('state', '=', 'a_risque')],
+            'termes_proches': [('tag', '>=', 37), grossesse_active],
+            'depassements_terme': [('tag', '>=', 41), grossesse_active],
+            'nouvelles_grossesses': [('create_date', '>=', date_debut)],
+            'grossesses_suivies': [grossesse_active, ('derniere_consultation', '>=', date_debut)],
+        }, domain=self._domaine_perimetre('salamet.grossesse'))
+        compteurs.update(self._compter('salamet.consultation', {
+            'consultations_today': [
+                ('date_consultation', '>=', today),
+                ('date_consultation', '<', today + timedelta(days=1)),
+            ],
+            'consultations_mois': [('date_consultation', '>=', date_debut)],
+        }, domain=self._domaine_perimetre('salamet.consultation')))
+        compteurs.update(self._compter('salamet.notification', {
+            'notifications_urgentes': [('priorite', 'in', ['critique', 'haute']), notification_ouverte],
+            'notifications_retard': [('date_echeance', '<', now), notification_ouverte],
+        }, domain=self._domaine_perimetre('salamet.notification')))
+        compteurs.update(self._compter('salamet.accouchement', {
+            'accouchements': [('date_accouchement', '>=', date_debut)],
+        }, domain=self._domaine_perimetre('salamet.accouchement')))
+        return compteurs
+
+    def _get_kpis(self, compteurs=None):
+        """Calculer les KPIs principaux"""
+        if compteurs is None:
+            compteurs = self._get_compteurs()
+        grossesses_actives = compteurs['grossesses_actives']
+        grossesses_risque = compteurs['grossesses_risque']
+        consultations_today = compteurs['consultations_today']
+        notifications_urgentes = compteurs['notifications_urgentes']
+        notifications_retard = compteurs['notifications_retard']
+        termes_proches = compteurs['termes_proches']
+        depassements_terme = compteurs['depassements_terme']
 
         return {
             'grossesses_actives': {
@@ -120,7 +264,7 @@ class SalametDashboard(models.Model):
 
     def _get_notifications_urgentes(self):
         """Récupérer les notifications urgentes"""
-        notifications = self.env['salamet.notification'].search([
+        notifications = self.env['salamet.notification'].search(self._domaine_perimetre('salamet.notification') + [
             ('priorite', 'in', ['critique', 'haute']),
             ('state', 'in', ['en_attente', 'vue'])
         ], limit=10, order='priorite desc, date_prevue asc')
@@ -139,7 +283,7 @@ class SalametDashboard(models.Model):
     def _get_consultations_jour(self):
         """Récupérer les consultations du jour"""
         today = fields.Date.today()
-        consultations = self.env['salamet.consultation'].search([
+        consultations = self.env['salamet.consultation'].search(self._domaine_perimetre('salamet.consultation') + [
             ('date_consultation', '>=', today),
             ('date_consultation', '<', today + timedelta(days=1))
         ], order='date_consultation asc')
@@ -157,7 +301,7 @@ class SalametDashboard(models.Model):
 
     def _get_grossesses_a_risque(self):
         """Récupérer les grossesses à risque"""
-        grossesses = self.env['salamet.grossesse'].search([
+        grossesses = self.env['salamet.grossesse'].search(self._domaine_perimetre('salamet.grossesse') + [
             ('state', '=', 'a_risque'),
             ('active', '=', True)
         ], limit=15, order='tag desc')
@@ -173,43 +317,20 @@ class SalametDashboard(models.Model):
             'niveau_risque': grossesse.niveau_risque,
         } for grossesse in grossesses]
 
-    def _get_statistiques(self):
-        """Calculer les statistiques générales"""
-        # Statistiques sur 30 derniers jours
-        date_debut = fields.Date.today() - timedelta(days=30)
-
-        # Nouvelles grossesses
-        nouvelles_grossesses = self.env['salamet.grossesse'].search_count([
-            ('date_creation', '>=', date_debut)
-        ])
-
-        # Consultations réalisées
-        consultations_mois = self.env['salamet.consultation'].search_count([
-            ('date_consultation', '>=', date_debut)
-        ])
-
-        # Accouchements
-        accouchements = self.env['salamet.grossesse'].search_count([
-            ('state', '=', 'terminee'),
-            ('date_fin', '>=', date_debut)
-        ])
+    def _get_statistiques(self, compteurs=None):
+        """Calculer les statistiques générales (30 derniers jours)"""
+        if compteurs is None:
+            compteurs = self._get_compteurs()
 
         # Taux de suivi (grossesses avec consultation récente)
-        grossesses_suivies = self.env['salamet.grossesse'].search_count([
-            ('state', 'in', ['en_cours', 'a_risque']),
-            ('derniere_consultation', '>=', date_debut)
-        ])
-
-        grossesses_totales = self.env['salamet.grossesse'].search_count([
-            ('state', 'in', ['en_cours', 'a_risque'])
-        ])
-
+        grossesses_suivies = compteurs['grossesses_suivies']
+        grossesses_totales = compteurs['grossesses_actives']
         taux_suivi = (grossesses_suivies / grossesses_totales * 100) if grossesses_totales > 0 else 0
 
         return {
-            'nouvelles_grossesses': nouvelles_grossesses,
-            'consultations_mois': consultations_mois,
-            'accouchements': accouchements,
+            'nouvelles_grossesses': compteurs['nouvelles_grossesses'],
+            'consultations_mois': compteurs['consultations_mois'],
+            'accouchements': compteurs['accouchements'],
             'taux_suivi': round(taux_suivi, 1),
         }
 
@@ -224,26 +345,20 @@ class SalametDashboard(models.Model):
 
     def _get_consultations_par_semaine(self):
         """Données pour graphique consultations par semaine"""
-        data = []
-        for i in range(8):  # 8 dernières semaines
-            date_fin = fields.Date.today() - timedelta(days=i * 7)
-            date_debut = date_fin - timedelta(days=6)
-
-            count = self.env['salamet.consultation'].search_count([
-                ('date_consultation', '>=', date_debut),
-                ('date_consultation', '<=', date_fin)
-            ])
-
-            data.append({
-                'semaine': f"S{date_fin.strftime('%W')}",
-                'consultations': count
-            })
-
-        return list(reversed(data))
+        today = fields.Date.today()
+        serie = self._serie_temporelle(
+            'salamet.consultation', 'date_consultation', 'week',
+            today - timedelta(weeks=7), today,
+            domain=self._domaine_perimetre('salamet.consultation'),
+        )
+        return [{
+            'semaine': f"S{semaine.strftime('%V')}",
+            'consultations': count
+        } for semaine, count in serie]
 
     def _get_pathologies_repartition(self):
         """Répartition des pathologies"""
-        pathologies = self.env['salamet.grossesse'].read_group([
+        pathologies = self.env['salamet.grossesse'].read_group(self._domaine_perimetre('salamet.grossesse') + [
             ('state', 'in', ['en_cours', 'a_risque']),
             ('active', '=', True)
         ], ['type_pathologie_principale'], ['type_pathologie_principale'])
@@ -255,7 +370,7 @@ class SalametDashboard(models.Model):
 
     def _get_notifications_par_type(self):
         """Répartition des notifications par type"""
-        notifications = self.env['salamet.notification'].read_group([
+        notifications = self.env['salamet.notification'].read_group(self._domaine_perimetre('salamet.notification') + [
             ('state', 'in', ['en_attente', 'vue'])
         ], ['type_notification'], ['type_notification'])
 
@@ -266,21 +381,16 @@ class SalametDashboard(models.Model):
 
     def _get_evolution_grossesses(self):
         """Évolution du nombre de grossesses sur 6 mois"""
-        data = []
-        for i in range(6):
-            date = fields.Date.today().replace(day=1) - timedelta(days=i * 30)
-
-            count = self.env['salamet.grossesse'].search_count([
-                ('date_creation', '>=', date),
-                ('date_creation', '<', date + timedelta(days=30))
-            ])
-
-            data.append({
-                'mois': date.strftime('%m/%Y'),
-                'grossesses': count
-            })
-
-        return list(reversed(data))
+        today = fields.Date.today()
+        serie = self._serie_temporelle(
+            'salamet.grossesse', 'create_date', 'month',
+            today - relativedelta(months=5), today,
+            domain=self._domaine_perimetre('salamet.grossesse'),
+        )
+        return [{
+            'mois': mois.strftime('%m/%Y'),
+            'grossesses': count
+        } for mois, count in serie]
 
     # =================== ACTIONS RAPIDES ===================
     @api.model
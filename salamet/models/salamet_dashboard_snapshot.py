@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models, fields, api
+from odoo.tools import SQL
+from odoo.tools.lru import LRU
+from datetime import timedelta
+import logging
+import time
+
+_logger = logging.getLogger(__name__)
+
+# Délai avant le recalcul déclenché par une invalidation : les écritures
+# rapprochées sont regroupées en un seul recalcul. Sans invalidation, la
+# tâche planifiée (toutes les 15 minutes) ne recalcule que les instantanés
+# d'un jour précédent, pour les indicateurs dépendant de la date du jour
+SNAPSHOT_DELAI_RECALCUL = timedelta(seconds=30)
+
+# Séquence des invalidations : chaque transaction qui modifie le tableau de
+# bord l'incrémente une fois validée, et chaque instantané retient la valeur
+# lue avant son calcul. Un instantané de version inférieure à la séquence
+# manque au moins une écriture. La séquence n'est pas transactionnelle : pas
+# de ligne partagée verrouillée par les écritures concurrentes
+SNAPSHOT_VERSION_SEQUENCE = 'salamet_dashboard_snapshot_version_seq'
+
+# Tableaux de bord par médecin : cache du processus (base, médecin) vidé par
+# les écritures de ce processus ; la durée de vie borne le décalage avec les
+# écritures des autres workers
+DASHBOARD_MEDECIN_TTL = 120
+_dashboards_medecins = LRU(256)
+
+# Canal du bus annonçant le recalcul des instantanés globaux
+DASHBOARD_BUS_CHANNEL = 'salamet_dashboard'
+
+
+class SalametDashboardSnapshot(models.Model):
+    _name = 'salamet.dashboard.snapshot'
+    _description = 'Instantané du tableau de bord SALAMET'
+    _order = 'company_id'
+
+    company_id = fields.Many2one(
+        'res.company',
+        string='Société',
+        required=True,
+        ondelete='cascade'
+    )
+
+    data = fields.Json(string='Données du tableau de bord')
+
+    date_calcul = fields.Datetime(string='Date de calcul')
+
+    # Valeur de la séquence des invalidations couverte par les données
+    version = fields.Integer(string='Version', default=0)
+
+    _sql_constraints = [
+        ('company_uniq', 'unique(company_id)', 'Un seul instantané par société.'),
+    ]
+
+    def init(self):
+        """Séquence des invalidations du tableau de bord"""
+        self.env.cr.execute(SQL(
+            "CREATE SEQUENCE IF NOT EXISTS %s", SQL.identifier(SNAPSHOT_VERSION_SEQUENCE),
+        ))
+
+    @api.model
+    def _version_courante(self):
+        """Dernière valeur de la séquence des invalidations (0 si aucune)"""
+        self.env.cr.execute(SQL(
+            "SELECT CASE WHEN is_called THEN last_value ELSE 0 END FROM %s",
+            SQL.identifier(SNAPSHOT_VERSION_SEQUENCE),
+        ))
+        return self.env.cr.fetchone()[0]
+
+    @api.model
+    def _creer(self, company):
+        """Créer l'instantané vide de la société s'il n'existe pas encore.
+
+        ``INSERT ... ON CONFLICT DO NOTHING`` sur la contrainte d'unicité :
+        deux requêtes concurrentes ne créent qu'une ligne, la seconde
+        attendant la validation de la première. Retourne l'instantané créé,
+        ou un ensemble vide s'il existait déjà.
+        """
+        self.env.cr.execute(SQL("""
+            INSERT INTO salamet_dashboard_snapshot
+                   (company_id, version, create_uid, create_date, write_uid, write_date)
+            VALUES (%s, 0, %s, now() AT TIME ZONE 'UTC', %s, now() AT TIME ZONE 'UTC')
+            ON CONFLICT (company_id) DO NOTHING
+            RETURNING id
+        """, company.id, self.env.uid, self.env.uid))
+        return self.sudo().browse([row[0] for row in self.env.cr.fetchall()])
+
+    @api.model
+    def _get_snapshot(self, company):
+        """Instantané de la société, calculé à la première lecture.
+
+        Ce premier calcul garde la version 0 : l'instantané de la requête a
+        pu commencer avant une écriture validée, c'est la tâche planifiée
+        qui lui attribue une version.
+        """
+        snapshot = self._creer(company)
+        if snapshot:
+            snapshot._rafraichir(0)
+            return snapshot
+        return self.sudo().search([('company_id', '=', company.id)], limit=1)
+
+    def _rafraichir(self, version):
+        """Recalculer les données du tableau de bord des instantanés (sans
+        règles d'accès : réservés aux médecins seniors et admins)"""
+        for snapshot in self:
+            dashboard = self.env['salamet.dashboard'].sudo().with_company(snapshot.company_id)
+            snapshot.write({
+                'data': dashboard._compute_dashboard_data(),
+                'date_calcul': fields.Datetime.now(),
+                'version': version,
+            })
+            self.env['bus.bus']._sendone(DASHBOARD_BUS_CHANNEL, 'salamet/dashboard', {
+                'perimetre': 'global',
+                'company_id': snapshot.company_id.id,
+                'date_calcul': fields.Datetime.to_string(snapshot.date_calcul),
+            })
+
+    @api.model
+    def _get_dashboard_medecin(self, medecin_id):
+        """(date de calcul, données) du tableau de bord du médecin en cache,
+        ou None s'il est absent ou expiré"""
+        try:
+            expiry, date_calcul, data = _dashboards_medecins[(self.env.cr.dbname, medecin_id)]
+        except KeyError:
+            return None
+        if expiry < time.monotonic():
+            return None
+        return date_calcul, data
+
+    @api.model
+    def _set_dashboard_medecin(self, medecin_id, data):
+        date_calcul = fields.Datetime.now()
+        _dashboards_medecins[(self.env.cr.dbname, medecin_id)] = (
+            time.monotonic() + DASHBOARD_MEDECIN_TTL, date_calcul, data,
+        )
+        return date_calcul, data
+
+    @api.model
+    def _invalider(self, medecin_ids=()):
+        """Programmer le recalcul des instantanés et oublier les tableaux de
+        bord en cache des médecins concernés.
+
+        Aucune ligne partagée n'est modifiée : la séquence des invalidations
+        est incrémentée une seule fois, après la validation de la
+        transaction (ses écritures sont alors visibles par le recalcul), et
+        la tâche planifiée est déclenchée une seule fois par transaction.
+        """
+        medecin_ids = set(medecin_ids)
+        for medecin_id in medecin_ids:
+            try:
+                del _dashboards_medecins[(self.env.cr.dbname, medecin_id)]
+            except KeyError:
+                pass
+
+        # Prévenir les tableaux de bord ouverts des médecins concernés, une
+        # fois par transaction
+        notifies = self.env.cr.precommit.data.setdefault('salamet_dashboard_medecins_notifies', set())
+        medecin_ids -= notifies
+        if medecin_ids:
+            notifies |= medecin_ids
+            medecins = self.env['salamet.medecin'].sudo().browse(medecin_ids)
+            for partner in medecins.user_id.partner_id:
+                self.env['bus.bus']._sendone(partner, 'salamet/dashboard', {'perimetre': 'medecin'})
+
+        if not self.env.cr.precommit.data.get('salamet_dashboard_recalcul'):
+            self.env.cr.precommit.data['salamet_dashboard_recalcul'] = True
+            registry = self.env.registry
+
+            @self.env.cr.postcommit.add
+            def incrementer_version():
+                with registry.cursor() as cr:
+                    cr.execute(SQL("SELECT nextval(%s)", SNAPSHOT_VERSION_SEQUENCE))
+
+            cron = self.env.ref('salamet.ir_cron_dashboard_snapshot', raise_if_not_found=False)
+            if cron:
+                cron.sudo()._trigger(fields.Datetime.now() + SNAPSHOT_DELAI_RECALCUL)
+
+    @api.model
+    def cron_rafraichir(self):
+        """Recalculer les instantanés en retard sur la séquence des
+        invalidations, ou calculés un jour précédent.
+
+        La version est lue puis la transaction validée avant le calcul : le
+        calcul voit alors toutes les écritures dont l'incrément est compris
+        dans cette version. Une écriture validée pendant le calcul incrémente
+        la séquence au-delà et sera reprise au passage suivant.
+        """
+        version = self._version_courante()
+        self.env.cr.commit()
+
+        for company in self.env['res.company'].search([]):
+            self._creer(company)
+        aujourd_hui = fields.Datetime.now().date()
+        a_recalculer = self.search([]).filtered(
+            lambda s: not s.date_calcul or s.version < version or s.date_calcul.date() < aujourd_hui
+        )
+        a_recalculer._rafraichir(version)
+        _logger.info("📊 %s instantanés du tableau de bord recalculés", len(a_recalculer))
+
+
+class SalametDashboardMixin(models.AbstractModel):
+    _name = 'salamet.dashboard.mixin'
+    _description = 'Invalidation du tableau de bord SALAMET'
+
+    # Champs dont la modification change le tableau de bord
+    _dashboard_fields = frozenset()
+
+    def _dashboard_medecin_ids(self):
+        """Médecins dont le tableau de bord dépend de ces enregistrements"""
+        records = self.sudo()
+        medecins = records.patiente_id.medecin_ids
+        if 'medecin_referent_id' in self._fields:
+            medecins |= records.medecin_referent_id
+        return medecins.ids
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self.env['salamet.dashboard.snapshot']._invalider(records._dashboard_medecin_ids())
+        return records
+
+    def write(self, vals):
+        if not self._dashboard_fields.intersection(vals):
+            return super().write(vals)
+        medecin_ids = []
+        if {'patiente_id', 'medecin_referent_id'}.intersection(vals):
+            medecin_ids = self._dashboard_medecin_ids()
+        result = super().write(vals)
+        self.env['salamet.dashboard.snapshot']._invalider(medecin_ids + self._dashboard_medecin_ids())
+        return result
+
+    def unlink(self):
+        medecin_ids = self._dashboard_medecin_ids()
+        result = super().unlink()
+        self.env['salamet.dashboard.snapshot']._invalider(medecin_ids)
+        return result
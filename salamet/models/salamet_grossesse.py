@@ -8,9 +8,14 @@ import math
 
 class SalametGrossesse(models.Model):
     _name = 'salamet.grossesse'
-    _inherit = ['mail.thread', 'mail.activity.mixin']
+    _inherit = ['mail.thread', 'mail.activity.mixin', 'salamet.sync.mixin', 'salamet.dashboard.mixin']
     _description = 'Grossesse SALAMET'
     _order = 'date_debut desc'
+    _dashboard_fields = frozenset([
+        'state', 'active', 'ddr', 'patiente_id', 'medecin_referent_id',
+        'type_pathologie_principale', 'derniere_consultation', 'pathologie_diabete',
+        'pathologie_hta', 'pathologie_preeclampsie', 'pathologie_rciu', 'pathologie_autre',
+    ])
 
     name = fields.Char(
         string='Référence',
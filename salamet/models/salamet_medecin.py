@@ -190,12 +190,19 @@ class SalametMedecin(models.Model):
             partner = self.env['res.partner'].create(partner_vals)
             record.partner_id = partner.id
 
+        # Le profil lié fait partie du rôle mis en cache
+        if record.user_id:
+            self.env['res.users']._invalider_roles_salamet(record.user_id.ids)
         return record
 
     def write(self, vals):
         """Synchronisation avec res.partner"""
+        old_user_ids = self.user_id.ids if 'user_id' in vals else []
         result = super().write(vals)
 
+        if 'user_id' in vals and set(old_user_ids) != set(self.user_id.ids):
+            self.env['res.users']._invalider_roles_salamet(old_user_ids + self.user_id.ids)
+
         # Synchroniser avec le contact
         partner_fields = {'nom_complet': 'name', 'phone': 'phone', 'email': 'email',
                           'street': 'street', 'city': 'city', 'zip': 'zip', 'country_id': 'country_id'}
@@ -215,9 +222,11 @@ class SalametMedecin(models.Model):
     def unlink(self):
         """Supprimer aussi le contact associé"""
         partners_to_delete = self.mapped('partner_id')
+        user_ids = self.user_id.ids
         result = super().unlink()
         if partners_to_delete:
             partners_to_delete.unlink()
+        self.env['res.users']._invalider_roles_salamet(user_ids)
         return result
 
     # =================== MÉTHODES D'AFFICHAGE ===================
@@ -11,9 +11,12 @@ _logger = logging.getLogger(__name__)
 class SalametNotification(models.Model):
     _name = 'salamet.notification'
     _description = 'Notifications de Surveillance SALAMET'
-    _inherit = ['mail.thread', 'mail.activity.mixin']
+    _inherit = ['mail.thread', 'mail.activity.mixin', 'salamet.sync.mixin', 'salamet.dashboard.mixin']
     _order = 'date_prevue desc, priorite desc'
     _rec_name = 'titre'
+    _dashboard_fields = frozenset([
+        'state', 'priorite', 'titre', 'type_notification', 'date_prevue', 'patiente_id',
+    ])
 
     # =================== CHAMPS DE BASE ===================
     titre = fields.Char(
@@ -61,6 +64,15 @@ class SalametNotification(models.Model):
         ondelete='cascade'
     )
 
+    # Utilisateur de la patiente, dénormalisé pour les règles d'accès
+    patiente_user_id = fields.Many2one(
+        'res.users',
+        string='Utilisateur patiente',
+        related='patiente_id.user_id',
+        store=True,
+        index=True
+    )
+
     grossesse_id = fields.Many2one(
         'salamet.grossesse',
         string='Grossesse',
@@ -558,5 +570,33 @@ class SalametNotification(models.Model):
             grossesse = self.env['salamet.grossesse'].browse(vals['grossesse_id'])
             vals['patiente_id'] = grossesse.patiente_id.id
 
-        return super().create(vals)
+        notification = super().create(vals)
+        notification._notifier_bus('creee')
+        return notification
+
+    def write(self, vals):
+        result = super().write(vals)
+        if {'state', 'priorite'}.intersection(vals):
+            self._notifier_bus('modifiee')
+        return result
+
+    # =================== ÉVÉNEMENTS TEMPS RÉEL ===================
+    def _notifier_bus(self, evenement):
+        """Publier un événement compact sur le bus pour la patiente et ses
+        médecins, à la place du rafraîchissement périodique des clients"""
+        bus = self.env['bus.bus']
+        for record in self.sudo():
+            payload = {
+                'evenement': evenement,
+                'id': record.id,
+                'titre': record.titre,
+                'priorite': record.priorite,
+                'urgente': record.priorite in ('haute', 'critique'),
+                'type': record.type_notification,
+                'state': record.state,
+                'patiente_id': record.patiente_id.id,
+            }
+            destinataires = record.patiente_id.medecin_ids.user_id | record.patiente_id.user_id
+            for partner in destinataires.partner_id:
+                bus._sendone(partner, 'salamet/notification', payload)
 
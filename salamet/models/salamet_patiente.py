@@ -8,17 +8,47 @@ import logging
 import re
 import secrets
 import string
+import time
+import unicodedata
 
 from odoo import api, fields, models
 from odoo.exceptions import ValidationError
+from odoo.tools import SQL
+from odoo.tools.lru import LRU
 
 _logger = logging.getLogger(__name__)
 
+# Un terme composé uniquement de chiffres et de séparateurs est un téléphone
+TELEPHONE_RECHERCHE_RE = re.compile(r"[\d\s+().-]+")
+
+# En dessous de cette longueur, une sous-chaîne quelconque n'est pas assez
+# sélective : on cherche alors en début de mot
+LONGUEUR_MIN_TRIGRAMME = 3
+
+
+# Suggestions de saisie : un petit LRU des préfixes récents par utilisateur
+# (base, uid), vidé à chaque écriture sur une patiente de ce processus ; la
+# durée de vie borne le décalage avec les écritures des autres workers
+SUGGEST_CACHE_TTL = 60
+SUGGEST_PREFIXES_PAR_UTILISATEUR = 64
+_suggest_caches = LRU(512)
+
+
+def normaliser_recherche(value):
+    """Texte en minuscules, sans accents et aux espaces réduits"""
+    value = unicodedata.normalize("NFKD", value or "")
+    value = "".join(c for c in value if not unicodedata.combining(c))
+    return " ".join(value.lower().split())
+
+
+def _echapper_like(value):
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
 
 class SalametPatiente(models.Model):
     _name = "salamet.patiente"
     _description = "Patiente SALAMET"
-    _inherit = ["mail.thread", "mail.activity.mixin"]
+    _inherit = ["mail.thread", "mail.activity.mixin", "salamet.sync.mixin"]
     _rec_name = "nom_complet"
     _order = "nom_complet"
 
@@ -59,6 +89,16 @@ class SalametPatiente(models.Model):
 
     email = fields.Char(string="Adresse email", tracking=True)
 
+    # Texte normalisé (sans accents, téléphone réduit aux chiffres) indexé
+    # en trigrammes pour la recherche de patientes
+    search_text = fields.Char(
+        string="Texte de recherche",
+        compute="_compute_search_text",
+        store=True,
+        index="trigram",
+        unaccent=False,
+    )
+
     adresse = fields.Text(string="Adresse complète")
 
     # -------------------- Informations conjugales --------------------
@@ -144,6 +184,18 @@ class SalametPatiente(models.Model):
         tracking=True,
     )
 
+    # Table d'accès matérialisée (utilisateur, patiente) des médecins traitants,
+    # utilisée par les règles d'accès à la place des jointures sur medecin_ids
+    access_user_ids = fields.Many2many(
+        "res.users",
+        "salamet_patiente_access",
+        "patiente_id",
+        "user_id",
+        string="Utilisateurs autorisés",
+        compute="_compute_access_user_ids",
+        store=True,
+    )
+
     grossesse_ids = fields.One2many(
         "salamet.grossesse", "patiente_id", string="Grossesses"
     )
@@ -215,6 +267,18 @@ class SalametPatiente(models.Model):
 
     active = fields.Boolean(string="Actif", default=True, tracking=True)
 
+    def init(self):
+        """Index utilisés par la pagination par curseur (nom_complet, id) et
+        par la recherche par préfixe des termes courts"""
+        self.env.cr.execute("""
+            CREATE INDEX IF NOT EXISTS salamet_patiente_nom_complet_id_idx
+            ON salamet_patiente (nom_complet, id)
+        """)
+        self.env.cr.execute("""
+            CREATE INDEX IF NOT EXISTS salamet_patiente_search_text_prefix_idx
+            ON salamet_patiente (search_text text_pattern_ops)
+        """)
+
     # -------------------- Calculs --------------------
     @api.depends("name")
     def _compute_nom_complet(self):
@@ -222,9 +286,25 @@ class SalametPatiente(models.Model):
         for record in self:
             if record.name:
                 nom_nettoye = " ".join(record.name.strip().split())
-                record.nom_complet = nom_nettoye.title()
+                record.nom_complet = nom_nettoye.title() or False
             else:
-                record.nom_complet = ""
+                # Vide stocké à NULL : trié en dernier par la pagination par curseur
+                record.nom_complet = False
+
+    @api.depends("nom_complet", "name", "email", "telephone")
+    def _compute_search_text(self):
+        """Nom, email et chiffres du téléphone, normalisés pour la recherche"""
+        for record in self:
+            parts = [record.nom_complet, record.email, re.sub(r"\D", "", record.telephone or "")]
+            if record.name and normaliser_recherche(record.name) != normaliser_recherche(record.nom_complet):
+                parts.insert(1, record.name)
+            record.search_text = normaliser_recherche(" ".join(p for p in parts if p))
+
+    @api.depends("medecin_ids.user_id")
+    def _compute_access_user_ids(self):
+        """Utilisateurs des médecins traitants de la patiente"""
+        for record in self:
+            record.access_user_ids = record.medecin_ids.user_id
 
     @api.depends("date_naissance")
     def _compute_age(self):
@@ -383,6 +463,9 @@ class SalametPatiente(models.Model):
 
         # Étape 2 : créer la patiente
         record = super(SalametPatiente, self).create(vals)
+        # Le profil lié fait partie du rôle mis en cache
+        if record.user_id:
+            self.env["res.users"]._invalider_roles_salamet(record.user_id.ids)
 
         # Étape 3 : créer le contact res.partner
         try:
@@ -400,11 +483,22 @@ class SalametPatiente(models.Model):
         if record.user_id:
             record.message_post(body=f"Utilisateur créé : {record.user_id.login}", message_type="notification", subtype_xmlid="mail.mt_comment")
 
+        _suggest_caches.clear()
         return record
 
     def write(self, vals):
         """Synchronisation avec res.partner et res.users lors des mises à jour."""
+        medecin_ids = self.medecin_ids.ids if "medecin_ids" in vals else []
+        old_user_ids = self.user_id.ids if "user_id" in vals else []
         result = super(SalametPatiente, self).write(vals)
+        _suggest_caches.clear()
+
+        # Le périmètre des tableaux de bord des médecins (ancien et nouveau) change
+        if medecin_ids or "medecin_ids" in vals:
+            self.env["salamet.dashboard.snapshot"]._invalider(medecin_ids + self.medecin_ids.ids)
+
+        if "user_id" in vals and set(old_user_ids) != set(self.user_id.ids):
+            self.env["res.users"]._invalider_roles_salamet(old_user_ids + self.user_id.ids)
 
         for record in self:
             # Synchroniser avec le contact associé
@@ -444,6 +538,8 @@ class SalametPatiente(models.Model):
         users_to_delete = self.mapped("user_id")
 
         result = super(SalametPatiente, self).unlink()
+        self.env["res.users"]._invalider_roles_salamet(users_to_delete.ids)
+        _suggest_caches.clear()
 
         if self._context.get("delete_partner", True):
             try:
@@ -511,6 +607,93 @@ class SalametPatiente(models.Model):
             return "preeclampsie"
         return "normale"
 
+    # -------------------- Recherche --------------------
+    @api.model
+    def _get_search_tokens(self, term):
+        """Découper un terme de recherche en jetons normalisés ; un numéro de
+        téléphone est réduit à ses chiffres"""
+        term = (term or "").strip()
+        if TELEPHONE_RECHERCHE_RE.fullmatch(term):
+            digits = re.sub(r"\D", "", term)
+            return [digits] if digits else []
+        return normaliser_recherche(term).split()
+
+    @api.model
+    def _get_search_domain(self, term):
+        """Domaine de recherche sur search_text : chaque jeton doit apparaître,
+        les jetons courts étant cherchés en début de mot (début du texte sur
+        l'index btree, ou après une espace sur l'index trigramme)"""
+        domain = []
+        for token in self._get_search_tokens(term):
+            if len(token) < LONGUEUR_MIN_TRIGRAMME:
+                prefix = _echapper_like(token) + "%"
+                domain += ["|", ("search_text", "=like", prefix),
+                           ("search_text", "=like", "% " + prefix)]
+            else:
+                domain.append(("search_text", "ilike", token))
+        return domain
+
+    @api.model
+    def search_ranked(self, term, domain=None, limit=None):
+        """Rechercher les patientes correspondant à ``term``, classées par
+        correspondance de préfixe puis par similarité trigramme"""
+        tokens = self._get_search_tokens(term)
+        query = self._search(list(domain or []) + self._get_search_domain(term))
+        order = self._order_to_sql(self._order, query)
+        if tokens:
+            column = self._field_to_sql(self._table, "search_text", query)
+            prefix = _echapper_like(tokens[0]) + "%"
+            rank = SQL(
+                "CASE WHEN %s LIKE %s THEN 0 WHEN %s LIKE %s THEN 1 ELSE 2 END",
+                column, prefix, column, "% " + prefix,
+            )
+            if self.env.registry.has_trigram:
+                rank = SQL("%s, similarity(%s, %s) DESC", rank, column, " ".join(tokens))
+            order = SQL("%s, %s", rank, order)
+        query.order = order
+        query.limit = limit
+        return self.browse(query.get_result_ids())
+
+    @api.model
+    def _suggest(self, term, limit=8):
+        """Suggestions légères (id, nom, badges) pour la saisie semi-automatique,
+        mises en cache par utilisateur et par préfixe normalisé"""
+        prefix = " ".join(self._get_search_tokens(term))
+        if not prefix:
+            return []
+
+        cache_key = (self.env.cr.dbname, self.env.uid)
+        try:
+            cache = _suggest_caches[cache_key]
+        except KeyError:
+            cache = _suggest_caches[cache_key] = LRU(SUGGEST_PREFIXES_PAR_UTILISATEUR)
+
+        now = time.monotonic()
+        try:
+            expiry, suggestions = cache[(prefix, limit)]
+            if expiry > now:
+                return suggestions
+        except KeyError:
+            pass
+
+        patientes = self.search_ranked(prefix, [("active", "=", True)], limit=limit)
+        suggestions = []
+        for row in patientes.read(["nom_complet", "age", "est_enceinte", "niveau_risque_global"]):
+            badges = []
+            if row["est_enceinte"]:
+                badges.append("enceinte")
+            if row["niveau_risque_global"] in ("eleve", "tres_eleve"):
+                badges.append(row["niveau_risque_global"])
+            suggestions.append({
+                "id": row["id"],
+                "name": row["nom_complet"] or "",
+                "age": row["age"] or 0,
+                "badges": badges,
+            })
+
+        cache[(prefix, limit)] = (now + SUGGEST_CACHE_TTL, suggestions)
+        return suggestions
+
     # -------------------- Actions UI --------------------
     def action_view_grossesses(self):
         self.ensure_one()
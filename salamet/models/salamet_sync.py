@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models, fields, api, Command
+from datetime import timedelta
+import logging
+
+_logger = logging.getLogger(__name__)
+
+# Durée de conservation des traces de suppression : un client dont le
+# watermark est plus ancien doit refaire une synchronisation complète.
+SYNC_TOMBSTONE_RETENTION_DAYS = 90
+
+# Recouvrement appliqué au watermark pour ne pas manquer les écritures des
+# transactions encore en cours au moment de la synchronisation précédente.
+SYNC_WATERMARK_OVERLAP = timedelta(seconds=60)
+
+# Nombre maximal d'enregistrements et de suppressions par page de
+# synchronisation ; ``next_cursor`` permet de demander la page suivante.
+SYNC_PAGE_SIZE = 500
+
+
+class SalametSyncTombstone(models.Model):
+    _name = 'salamet.sync.tombstone'
+    _description = 'Trace de suppression pour la synchronisation SALAMET'
+    _order = 'date_suppression, id'
+    _log_access = False
+
+    res_model = fields.Char(
+        string='Modèle',
+        required=True,
+        index=True
+    )
+
+    res_id = fields.Integer(
+        string='ID supprimé',
+        required=True
+    )
+
+    date_suppression = fields.Datetime(
+        string='Date de suppression',
+        required=True,
+        index=True,
+        default=fields.Datetime.now
+    )
+
+    # Utilisateurs ayant accès à la patiente de l'enregistrement supprimé :
+    # seuls eux reçoivent la suppression, hors médecins seniors et admins
+    user_ids = fields.Many2many(
+        'res.users',
+        'salamet_sync_tombstone_res_users_rel',
+        'tombstone_id',
+        'user_id',
+        string='Utilisateurs concernés'
+    )
+
+    def init(self):
+        """Index composite utilisé par la requête de synchronisation"""
+        self.env.cr.execute("""
+            CREATE INDEX IF NOT EXISTS salamet_sync_tombstone_model_date_idx
+            ON salamet_sync_tombstone (res_model, date_suppression)
+        """)
+
+    @api.model
+    def cron_purger_traces(self):
+        """Supprimer les traces plus anciennes que la durée de conservation"""
+        limite = fields.Datetime.now() - timedelta(days=SYNC_TOMBSTONE_RETENTION_DAYS)
+        self.env.cr.execute(
+            "DELETE FROM salamet_sync_tombstone WHERE date_suppression < %s",
+            [limite],
+        )
+        _logger.info("🧹 %s traces de suppression purgées", self.env.cr.rowcount)
+
+
+class SalametSyncMixin(models.AbstractModel):
+    _name = 'salamet.sync.mixin'
+    _description = 'Synchronisation incrémentale SALAMET'
+
+    def unlink(self):
+        """Enregistrer une trace de suppression pour la synchronisation, y
+        compris pour les enregistrements supprimés en cascade par la base"""
+        tombstones = self._sync_tombstone_vals()
+        for children in self._sync_cascade_children():
+            tombstones += children._sync_tombstone_vals()
+        result = super().unlink()
+        if tombstones:
+            self.env['salamet.sync.tombstone'].sudo().create(tombstones)
+        return result
+
+    def _sync_tombstone_vals(self):
+        """Valeurs des traces de suppression de ces enregistrements, avec les
+        utilisateurs ayant accès à leur patiente"""
+        now = fields.Datetime.now()
+        vals_list = []
+        for record in self.sudo().with_context(active_test=False):
+            patiente = record if record._name == 'salamet.patiente' else record.patiente_id
+            vals_list.append({
+                'res_model': record._name,
+                'res_id': record.id,
+                'date_suppression': now,
+                'user_ids': [Command.set((patiente.access_user_ids | patiente.user_id).ids)],
+            })
+        return vals_list
+
+    def _sync_cascade_children(self):
+        """Enregistrements synchronisés que PostgreSQL supprimera avec ceux-ci
+        (clés ``ondelete='cascade'``) sans appeler leur ``unlink``"""
+        if not self:
+            return []
+        children_list = []
+        for model_name in self.env.registry.descendants(['salamet.sync.mixin'], '_inherit'):
+            model = self.env[model_name].sudo().with_context(active_test=False)
+            if model._abstract or model_name == self._name:
+                continue
+            for field in model._fields.values():
+                if field.type == 'many2one' and field.store and field.ondelete == 'cascade' \
+                        and field.comodel_name == self._name:
+                    children = model.search([(field.name, 'in', self.ids)])
+                    if children:
+                        children_list.append(children)
+                        children_list += children._sync_cascade_children()
+        return children_list
+
+    @api.model
+    def _sync_tombstone_scoped(self):
+        """Indiquer si les suppressions doivent être limitées à celles de
+        l'utilisateur : patientes et médecins résidents n'ont accès qu'à leurs
+        propres patientes, les médecins seniors et admins à toutes"""
+        user = self.env.user
+        if self.env.su or user.has_group('salamet.group_salamet_medecin_senior'):
+            return False
+        return user.has_group('salamet.group_salamet_patiente') \
+            or user.has_group('salamet.group_salamet_medecin_resident')
+
+    @api.model
+    def _sync_changes(self, since=None, fields_list=None, limit=SYNC_PAGE_SIZE, cursor=None):
+        """Retourner les enregistrements modifiés et supprimés depuis le
+        watermark ``since`` ainsi que le nouveau watermark.
+
+        Les deux listes sont paginées par ``limit`` : tant que ``next_cursor``
+        est renseigné, le client rappelle avec le même ``since`` et ce
+        curseur, et le watermark n'est retourné qu'avec la dernière page.
+
+        Sans watermark (ou avec un watermark antérieur à la conservation des
+        traces), ``reset`` indique au client de remplacer toute sa copie.
+        """
+        cursor = cursor or {}
+        watermark = fields.Datetime.to_datetime(cursor.get('watermark')) or self.env.cr.now()
+        limite_traces = watermark - timedelta(days=SYNC_TOMBSTONE_RETENTION_DAYS)
+        since = fields.Datetime.to_datetime(since) if since else None
+        reset = not since or since < limite_traces
+
+        # Enregistrements modifiés, parcourus par (write_date, id)
+        records = []
+        records_cursor = None
+        if cursor.get('records', True):
+            domain = []
+            if not reset:
+                domain = [('write_date', '>', since - SYNC_WATERMARK_OVERLAP)]
+            if cursor.get('records'):
+                write_date, last_id = cursor['records']
+                domain += ['|', ('write_date', '>', write_date),
+                           '&', ('write_date', '=', write_date), ('id', '>', last_id)]
+            page = self.search_fetch(domain, ['write_date'], order='write_date, id', limit=limit)
+            records = page.read(fields_list)
+            if limit and len(page) == limit:
+                records_cursor = [fields.Datetime.to_string(page[-1].write_date), page[-1].id]
+
+        # Suppressions, parcourues par id de trace
+        deleted_ids = []
+        deleted_cursor = None
+        if not reset and cursor.get('deleted', True):
+            domain = [
+                ('res_model', '=', self._name),
+                ('date_suppression', '>', since - SYNC_WATERMARK_OVERLAP),
+            ]
+            if self._sync_tombstone_scoped():
+                domain.append(('user_ids', 'in', [self.env.uid]))
+            if cursor.get('deleted'):
+                domain.append(('id', '>', cursor['deleted']))
+            tombstones = self.env['salamet.sync.tombstone'].sudo().search_read(
+                domain, ['res_id'], order='id', limit=limit)
+            deleted_ids = list({t['res_id'] for t in tombstones})
+            if limit and len(tombstones) == limit:
+                deleted_cursor = tombstones[-1]['id']
+
+        next_cursor = None
+        if records_cursor or deleted_cursor:
+            # Une liste terminée est marquée False pour ne plus être relue
+            next_cursor = {
+                'watermark': fields.Datetime.to_string(watermark),
+                'records': records_cursor or False,
+                'deleted': deleted_cursor or False,
+            }
+
+        return {
+            'records': records,
+            'deleted_ids': deleted_ids,
+            'watermark': None if next_cursor else fields.Datetime.to_string(watermark),
+            'next_cursor': next_cursor,
+            'reset': reset,
+        }
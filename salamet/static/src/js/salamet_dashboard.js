@@ -27,7 +27,7 @@ odoo.define('salamet.dashboard', function (require) {
             var self = this;
             return rpc.query({
                 model: 'salamet.dashboard',
-                method: 'get_dashboard_data',
+                method: 'get_dashboard_data_medecin',
             }).then(function(data) {
                 self.dashboardData = data;
                 self.renderDashboard();
@@ -257,10 +257,17 @@ odoo.define('salamet.dashboard', function (require) {
 
         setupAutoRefresh: function() {
             var self = this;
-            // Actualiser toutes les 5 minutes
+            // Actualiser sur les événements du bus plutôt que par interrogation
+            var reload = _.debounce(function() {
+                self.loadDashboardData();
+            }, 2000);
+            this.call('bus_service', 'addChannel', 'salamet_dashboard');
+            this.call('bus_service', 'subscribe', 'salamet/dashboard', reload);
+            this.call('bus_service', 'subscribe', 'salamet/notification', reload);
+            // Filet de sécurité pour les indicateurs liés à la date du jour
             setInterval(function() {
                 self.loadDashboardData();
-            }, 300000);
+            }, 900000);
         },
 
         updateCurrentDate: function() {
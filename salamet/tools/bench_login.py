@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""Mesure du débit d'authentification de /api/auth/login.
+
+Script autonome (bibliothèque standard uniquement), lancé contre un serveur
+Odoo démarré avec le module SALAMET :
+
+    python3 salamet/tools/bench_login.py --url http://localhost:8069 \\
+        --db salamet --login medecin@example.com --password secret \\
+        --requests 500 --concurrency 8
+
+Pour comparer avant et après l'optimisation du chemin de connexion, lancer
+le script sur le serveur à la révision précédente puis à la révision
+courante, avec les mêmes paramètres. ``--route /web/session/authenticate``
+mesure en référence la connexion standard d'Odoo sur le même serveur.
+
+Chaque connexion ouvre une session neuve ; avec le cache des identifiants
+vérifiés, seule la première connexion du compte recalcule la KDF.
+"""
+
+import argparse
+import http.cookiejar
+import json
+import statistics
+import sys
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+
+def _payload(route, db, login, password):
+    """Corps JSON-RPC attendu par la route mesurée"""
+    if route == '/web/session/authenticate':
+        params = {'db': db, 'login': login, 'password': password}
+    else:
+        params = {'email': login, 'password': password}
+    # /api/auth/login lit le corps brut : les paramètres sont aussi à la racine
+    return json.dumps({'jsonrpc': '2.0', 'method': 'call', 'params': params, **params}).encode()
+
+
+def _login(url, route, db, login, password):
+    """Une connexion dans une session neuve : (durée en secondes, succès)"""
+    opener = urllib.request.build_opener(
+        urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+    request = urllib.request.Request(
+        url.rstrip('/') + route,
+        data=_payload(route, db, login, password),
+        headers={'Content-Type': 'application/json', 'X-Odoo-Database': db},
+    )
+    start = time.perf_counter()
+    with opener.open(request, timeout=60) as response:
+        body = json.loads(response.read() or b'{}')
+    elapsed = time.perf_counter() - start
+    result = body.get('result') or {}
+    ok = 'error' not in body and (result.get('success') or result.get('uid'))
+    return elapsed, bool(ok)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='http://localhost:8069')
+    parser.add_argument('--db', required=True)
+    parser.add_argument('--login', required=True)
+    parser.add_argument('--password', required=True)
+    parser.add_argument('--route', default='/api/auth/login')
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--warmup', type=int, default=10)
+    args = parser.parse_args(argv)
+
+    def run(_i):
+        return _login(args.url, args.route, args.db, args.login, args.password)
+
+    for i in range(args.warmup):
+        run(i)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        results = list(executor.map(run, range(args.requests)))
+    total = time.perf_counter() - start
+
+    durations = sorted(elapsed for elapsed, _ok in results)
+    succes = sum(ok for _elapsed, ok in results)
+    quantiles = statistics.quantiles(durations, n=100)
+    print(f"route        : {args.route}")
+    print(f"requêtes     : {len(results)} ({succes} réussies), concurrence {args.concurrency}")
+    print(f"débit        : {len(results) / total:.1f} connexions/s")
+    print(f"latence (ms) : médiane {statistics.median(durations) * 1000:.1f}"
+          f", p95 {quantiles[94] * 1000:.1f}, max {durations[-1] * 1000:.1f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""Mesure de la liste des patientes d'un médecin résident suivant 5 000
+patientes, avec la règle d'accès matérialisée (access_user_ids) et avec
+l'ancienne règle sur medecin_ids.
+
+Script à exécuter dans le shell Odoo, sur une base de test où le module
+SALAMET est installé :
+
+    odoo-bin shell -d salamet_bench < salamet/tools/bench_patientes_rule.py
+
+Les données (un médecin résident, BENCH_PATIENTES patientes qui lui sont
+assignées et autant assignées à un autre médecin) sont créées au premier
+lancement puis validées, pour que les lancements suivants mesurent la même
+base. L'ancienne règle n'est appliquée que le temps de la mesure et la
+transaction est annulée ensuite.
+"""
+
+import statistics
+import time
+
+from odoo.tools import mute_logger
+
+BENCH_PATIENTES = 5000
+BENCH_REPETITIONS = 20
+BENCH_PAGE = 20
+BENCH_LOGIN = 'bench.resident@salamet.test'
+BENCH_LOGIN_AUTRE = 'bench.autre@salamet.test'
+
+# Règle du médecin résident avant la table d'accès matérialisée
+ANCIENNE_REGLE = "['|', ('medecin_ids', 'in', [user.id]), ('medecin_ids.user_id', '=', user.id)]"
+
+
+def _medecin(env, login, groupe):
+    """Médecin de test et son utilisateur, créés si besoin"""
+    user = env['res.users'].search([('login', '=', login)])
+    if not user:
+        user = env['res.users'].create({
+            'name': login, 'login': login, 'password': login,
+            'groups_id': [(4, env.ref(groupe).id)],
+        })
+    medecin = env['salamet.medecin'].search([('user_id', '=', user.id)])
+    if not medecin:
+        medecin = env['salamet.medecin'].create({
+            'user_id': user.id, 'nom_complet': login, 'phone': '0600000000',
+            'email': login, 'faculte_origine': 'Bench', 'lieu_exercice': 'Bench',
+        })
+    return medecin
+
+
+def _seed(env):
+    """Créer les patientes de test manquantes"""
+    env = env(context=dict(env.context, tracking_disable=True, mail_create_nolog=True))
+    resident = _medecin(env, BENCH_LOGIN, 'salamet.group_salamet_medecin_resident')
+    autre = _medecin(env, BENCH_LOGIN_AUTRE, 'salamet.group_salamet_medecin_resident')
+    Patiente = env['salamet.patiente']
+    for medecin in (resident, autre):
+        existantes = Patiente.search_count([('medecin_ids', 'in', medecin.ids)])
+        with mute_logger('odoo.addons.salamet.models.salamet_patiente'):
+            for i in range(existantes, BENCH_PATIENTES):
+                Patiente.create({
+                    'name': f'Bench {medecin.id} {i:05d}',
+                    'date_naissance': '1990-01-01',
+                    'medecin_ids': [(6, 0, medecin.ids)],
+                })
+    env.cr.commit()
+    return resident
+
+
+def _mesurer(env, resident):
+    """Durées (s) de la liste paginée et du total vus par le médecin"""
+    Patiente = env['salamet.patiente'].with_user(resident.user_id)
+    domain = [('active', '=', True), ('medecin_ids', 'in', resident.ids)]
+    durees = []
+    for _i in range(BENCH_REPETITIONS):
+        env.invalidate_all()
+        start = time.perf_counter()
+        Patiente.search(domain, limit=BENCH_PAGE, order='nom_complet')
+        Patiente.search_count(domain)
+        durees.append(time.perf_counter() - start)
+    return durees
+
+
+def _afficher(libelle, durees):
+    print(f"{libelle:<22} médiane {statistics.median(durees) * 1000:7.1f} ms"
+          f"   min {min(durees) * 1000:7.1f} ms   max {max(durees) * 1000:7.1f} ms")
+
+
+def main(env):
+    resident = _seed(env)
+    regle = env.ref('salamet.salamet_rule_patiente_medecin_resident')
+    nouvelle_regle = regle.domain_force
+
+    _afficher('access_user_ids', _mesurer(env, resident))
+    regle.domain_force = ANCIENNE_REGLE
+    env.flush_all()
+    _afficher('ancienne règle', _mesurer(env, resident))
+    regle.domain_force = nouvelle_regle
+    env.cr.rollback()
+
+
+main(env)  # noqa: F821 (fourni par odoo-bin shell)